@@ -0,0 +1,769 @@
+#!/usr/bin/env python3
+"""
+Benchmarks for the Wikipedia MCP server.
+
+Runs the real tool handlers from main.py against a stand-in for Wikipedia
+with a fixed, known latency, so the numbers show server behaviour rather
+than network noise. `suite` goes through the real HTTP client against
+mock_api.py; the other benchmarks replace the client with FakeClient.
+
+Usage:
+    uv run python bench.py concurrency --calls 8 --latency 0.2
+    uv run python bench.py fallback --latency 0.2
+    uv run python bench.py batch --titles 20
+    uv run python bench.py coalesce --calls 100
+    uv run python bench.py load --transport streamable-http --clients 20
+    uv run python bench.py suite --iterations 50 --latency 0.01
+    uv run python bench.py resilience --error-rate 0.2
+    uv run python bench.py storage --articles 200
+    uv run python bench.py startup --runs 10
+    uv run python bench.py replay calls.jsonl --speed 10 --cache-size 0 512 --workers 4 8
+"""
+
+import argparse
+import asyncio
+import dataclasses
+import json
+import logging
+import os
+import random
+import socket
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+
+import main
+from mock_api import MockWikipedia
+
+
+class FakeClient:
+    """Stands in for main.WikipediaClient, sleeping instead of calling the API."""
+
+    def __init__(
+        self, lang: str, latencies: dict[str, float], missing: frozenset = frozenset()
+    ):
+        self.lang = lang
+        self.latencies = latencies
+        self.missing = missing
+        self.requests = 0
+
+    def search(self, query: str, limit: int = 10) -> list[str]:
+        self.requests += 1
+        time.sleep(self.latencies[query])
+        return [f"{query} {n}" for n in range(limit)]
+
+    def page(self, title, auto_suggest=False, summary=False, content=False):
+        self.requests += 1
+        time.sleep(self.latencies[title])
+        return self._page(title, summary, content)
+
+    def pages(self, titles, summary=False):
+        self.requests += 1
+        time.sleep(max(self.latencies[title] for title in titles))
+        results = {}
+        for title in titles:
+            try:
+                results[title] = self._page(title, summary, False)
+            except main.PageError as e:
+                results[title] = e
+        return results
+
+    def _page(self, title, summary, content):
+        if title in self.missing:
+            raise main.PageError(title)
+        intro = f"{title} is a test article."
+        text = intro + " Lorem ipsum dolor sit amet." * 40
+        return main.Page(
+            title=title,
+            url=f"https://{self.lang}.wikipedia.org/wiki/{title.replace(' ', '_')}",
+            length=len(text) * 3,  # page source is bigger than its plain text
+            summary=intro,
+            content=text if content else "",
+        )
+
+
+def install_fake_clients(
+    latencies: dict[str, float],
+    missing_in_simple: frozenset = frozenset(),
+    cache_size: int = 0,
+):
+    """Route every language to a FakeClient with known latencies."""
+    main.cache = main.ResponseCache(size=cache_size, ttl=3600, path="")
+    main.inflight = main.SingleFlight()
+    main.title_index = main.TitleIndex()
+    main.clients["simple"] = FakeClient("simple", latencies, missing_in_simple)
+    main.clients["en"] = FakeClient("en", latencies)
+
+
+async def bench_concurrency(calls: int, latency: float):
+    # Spread latencies so the slowest call is clearly different from the sum
+    latencies = {
+        f"Article {n}": latency * random.uniform(0.5, 1.0) for n in range(calls)
+    }
+    latencies[f"Article {calls - 1}"] = latency
+    install_fake_clients(latencies)
+
+    started = time.perf_counter()
+    await asyncio.gather(
+        *(main.handle_call_tool("summary", {"title": title}) for title in latencies)
+    )
+    elapsed = time.perf_counter() - started
+
+    print(f"calls:            {calls}")
+    print(f"max workers:      {main.MAX_WORKERS}")
+    print(f"slowest call:     {max(latencies.values()):.3f}s")
+    print(f"sum of all calls: {sum(latencies.values()):.3f}s")
+    print(f"wall time:        {elapsed:.3f}s")
+
+
+async def bench_fallback(latency: float):
+    """A page missing from Simple English, looked up sequentially and hedged."""
+    title = "English Only"
+    install_fake_clients({title: latency}, missing_in_simple=frozenset([title]))
+
+    print(f"upstream latency: {latency:.3f}s")
+    for hedged in (False, True):
+        main.HEDGED = hedged
+        started = time.perf_counter()
+        result = await main.handle_call_tool("summary", {"title": title})
+        elapsed = time.perf_counter() - started
+        served = "en" if "**Language Code:** en" in result[0].text else "simple"
+        mode = "hedged" if hedged else "sequential"
+        print(f"{mode + ':':<18}{elapsed:.3f}s (served from {served})")
+
+
+async def bench_batch(titles: int, latency: float):
+    """Summaries for a page of search results: one call per title vs. one batch."""
+    latencies = {f"Result {n}": latency for n in range(titles)}
+    names = list(latencies)
+
+    for mode in ("per-title", "batch"):
+        install_fake_clients(latencies)
+        started = time.perf_counter()
+        if mode == "batch":
+            await main.handle_call_tool("summary_batch", {"titles": names})
+        else:
+            await asyncio.gather(
+                *(main.handle_call_tool("summary", {"title": t}) for t in names)
+            )
+        elapsed = time.perf_counter() - started
+        requests = sum(client.requests for client in main.clients.values())
+        print(f"{mode + ':':<11}{requests:>3} upstream requests, {elapsed:.3f}s")
+
+
+async def bench_coalesce(calls: int, latency: float) -> bool:
+    """
+    Many identical summary calls at once, with the cache disabled so only
+    single-flight can share the work. Exactly one upstream fetch must happen.
+    """
+    title = "Trending"
+    install_fake_clients({title: latency})
+    # Hedging adds the English and auto_suggest lookups, each coalesced too
+    main.HEDGED = False
+
+    started = time.perf_counter()
+    results = await asyncio.gather(
+        *(main.handle_call_tool("summary", {"title": title}) for _ in range(calls))
+    )
+    elapsed = time.perf_counter() - started
+    requests = sum(client.requests for client in main.clients.values())
+    same = all(result[1].text == results[0][1].text for result in results)
+
+    print(f"calls:             {calls}")
+    print(f"upstream requests: {requests}")
+    print(f"coalesced:         {main.inflight.snapshot()['coalesced']}")
+    print(f"identical results: {same}")
+    print(f"wall time:         {elapsed:.3f}s")
+    return requests == 1 and same
+
+
+@asynccontextmanager
+async def mcp_session(transport: str, port: int):
+    """An initialised MCP client session against the local HTTP server."""
+    from mcp import ClientSession
+
+    if transport == "sse":
+        from mcp.client.sse import sse_client
+
+        connection = sse_client(f"http://127.0.0.1:{port}/sse")
+    else:
+        from mcp.client.streamable_http import streamablehttp_client
+
+        connection = streamablehttp_client(f"http://127.0.0.1:{port}/mcp/")
+    async with (
+        connection as (read_stream, write_stream, *_),
+        ClientSession(read_stream, write_stream) as session,
+    ):
+        await session.initialize()
+        yield session
+
+
+async def bench_load(
+    transport: str, clients: int, calls: int, titles: int, latency: float
+):
+    """
+    Serve main.py over HTTP in this process and have `clients` MCP sessions
+    each make `calls` summary calls for random titles.
+    """
+    import uvicorn
+
+    # Per-request INFO logs from the server and client would swamp the results
+    logging.getLogger().setLevel(logging.WARNING)
+    install_fake_clients(
+        {f"Article {n}": latency for n in range(titles)}, cache_size=titles
+    )
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    http = uvicorn.Server(
+        uvicorn.Config(
+            main.http_app(transport), host="127.0.0.1", port=port, log_level="warning"
+        )
+    )
+    serving = asyncio.create_task(http.serve())
+    while not http.started:
+        await asyncio.sleep(0.01)
+
+    latencies = []
+
+    async def client():
+        async with mcp_session(transport, port) as session:
+            for _ in range(calls):
+                title = f"Article {random.randrange(titles)}"
+                started = time.perf_counter()
+                await session.call_tool("summary", {"title": title})
+                latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(clients)))
+    elapsed = time.perf_counter() - started
+    http.should_exit = True
+    await serving
+
+    cuts = statistics.quantiles(latencies, n=100)
+    requests = sum(client.requests for client in main.clients.values())
+    print(f"transport:         {transport}")
+    print(f"clients x calls:   {clients} x {calls}")
+    print(f"upstream requests: {requests} ({titles} titles, {latency:.3f}s each)")
+    print(f"requests/sec:      {len(latencies) / elapsed:.1f}")
+    print(f"p50 latency:       {cuts[49] * 1000:.1f}ms")
+    print(f"p99 latency:       {cuts[98] * 1000:.1f}ms")
+
+
+# name, tool, arguments, text the answer must contain
+SCENARIOS = [
+    ("search", "search", {"query": "Earth"}, "**Language Code:** simple"),
+    ("search snippets", "search", {"query": "Moon", "snippets": True}, "bytes)"),
+    ("summary", "summary", {"title": "Earth"}, "# Page Summary"),
+    ("summary redirect", "summary", {"title": "The Earth"}, "**Title:** Earth"),
+    ("content", "content", {"title": "Moon"}, "== Section 5 =="),
+    (
+        "content sentence",
+        "content",
+        {"title": "Moon", "detail": "sentence"},
+        "article.",
+    ),
+    (
+        "content outline",
+        "content",
+        {"title": "Moon", "detail": "outline"},
+        "5. Section",
+    ),
+    ("content max_tokens", "content", {"title": "Moon", "max_tokens": 100}, "Offset:"),
+    (
+        "summary sentence",
+        "summary",
+        {"title": "Earth", "detail": "sentence"},
+        "article.",
+    ),
+    ("sections", "sections", {"title": "Moon"}, "5. Section 5 ("),
+    ("section", "section", {"title": "Moon", "section": "Section 3"}, "of Moon has"),
+    ("section by index", "section", {"title": "Moon", "index": 0}, "test article"),
+    ("fallback stub", "summary", {"title": "Stub"}, "**Language Code:** en"),
+    ("fallback missing", "content", {"title": "English Only"}, "**Language Code:** en"),
+    (
+        "fallback chain",
+        "content",
+        {"title": "German Only", "languages": ["simple", "en", "de"]},
+        "**Language Code:** de",
+    ),
+    (
+        "chain order",
+        "summary",
+        {"title": "Earth", "languages": ["en", "simple"]},
+        "**Language Code:** en",
+    ),
+    ("disambiguation", "summary", {"title": "Mercury"}, "- Mercury (planet)"),
+    ("not found", "summary", {"title": "No Such Page"}, "# Summary Not Found"),
+    # Moon is in the title index by now, so no auto_suggest search is needed
+    ("title correction", "content", {"title": "MOON"}, "**Title:** Moon"),
+    ("batch", "summary_batch", {"titles": ["Earth", "Moon", "Stub"]}, "Moon"),
+]
+
+
+def use_mock_api(mock: MockWikipedia, cache_size: int = 0, ttl: float = 3600):
+    """
+    Send main.py's real clients to `mock`, with the cache off by default.
+    The stand-in has no rate limit to respect, so pacing is off too.
+    """
+    main.API_URL = mock.url
+    main.RATE_LIMIT = 0
+    main.clients.clear()
+    main.cache = main.ResponseCache(size=cache_size, ttl=ttl, path="")
+    main.inflight = main.SingleFlight()
+    main.title_index = main.TitleIndex()
+
+
+def percentiles(times: list[float]) -> tuple[float, float]:
+    """p50 and p99 in milliseconds."""
+    if len(times) < 2:
+        return times[0] * 1000, times[0] * 1000
+    cuts = statistics.quantiles(times, n=100)
+    return cuts[49] * 1000, cuts[98] * 1000
+
+
+async def bench_suite(iterations: int, latency: float, concurrency: int) -> bool:
+    """
+    Every tool and fallback path through the real MediaWiki client, against
+    mock_api.py. Returns False if any answer was not what the path should
+    produce.
+    """
+    logging.getLogger().setLevel(logging.WARNING)
+    mock = MockWikipedia(latency=latency).start()
+    use_mock_api(mock)
+    ok = True
+
+    print(f"upstream latency {latency * 1000:.0f}ms, {iterations} calls each")
+    print(
+        f"{'scenario':<20}{'p50 ms':>9}{'p99 ms':>9}{'upstream/call':>15}"
+        f"{'bytes':>8}  check"
+    )
+    for name, tool, arguments, expected in SCENARIOS:
+        times = []
+        before = sum(mock.requests.values())
+        passed = True
+        for _ in range(iterations):
+            started = time.perf_counter()
+            result = await main.handle_call_tool(tool, arguments)
+            times.append(time.perf_counter() - started)
+            passed = passed and any(expected in block.text for block in result)
+        size = sum(len(block.text.encode()) for block in result)
+        upstream = (sum(mock.requests.values()) - before) / iterations
+        p50, p99 = percentiles(times)
+        print(
+            f"{name:<20}{p50:>9.1f}{p99:>9.1f}{upstream:>15.1f}{size:>8}  "
+            f"{'ok' if passed else 'WRONG'}"
+        )
+        ok = ok and passed
+
+    titles = [f"Article {n}" for n in range(concurrency)]
+    started = time.perf_counter()
+    for _ in range(iterations):
+        await asyncio.gather(
+            *(main.handle_call_tool("summary", {"title": t}) for t in titles)
+        )
+    elapsed = time.perf_counter() - started
+    calls = iterations * concurrency
+    print(
+        f"concurrent load: {calls} summary calls, {concurrency} at a time, "
+        f"{calls / elapsed:.1f} calls/s"
+    )
+
+    mock.stop()
+    return ok
+
+
+async def bench_resilience(calls: int, error_rate: float, latency: float):
+    """
+    Summary calls while the stand-in fails `error_rate` of its requests, with
+    and without retries; then a full outage, answered from expired entries.
+    """
+    # The failed calls' error logs would bury the results
+    logging.getLogger().setLevel(logging.CRITICAL)
+    mock = MockWikipedia(latency=latency, error_rate=error_rate, retry_after=0).start()
+    main.BACKOFF_BASE = 0.01
+    titles = [f"Article {n}" for n in range(calls)]
+
+    async def run(label: str):
+        before = sum(mock.requests.values())
+        started = time.perf_counter()
+        results = await asyncio.gather(
+            *(main.handle_call_tool("summary", {"title": t}) for t in titles)
+        )
+        elapsed = time.perf_counter() - started
+        failed = sum("# Summary Error" in result[0].text for result in results)
+        upstream = sum(mock.requests.values()) - before
+        print(
+            f"{label:<24}{failed:>4}/{calls} failed, "
+            f"{upstream:>4} upstream requests, {elapsed:.2f}s"
+        )
+
+    print(f"upstream error rate {error_rate:.0%}, {calls} summary calls")
+    retries = main.RETRIES or 3
+    for main.RETRIES in (0, retries):
+        use_mock_api(mock)
+        await run(f"retries={main.RETRIES}:")
+
+    # Every entry expires at once, then Wikipedia goes down
+    use_mock_api(mock, cache_size=calls * 2, ttl=0)
+    mock.error_rate = 0
+    await run("warm cache:")
+    mock.error_rate = 1
+    await run("outage, stale entries:")
+    mock.stop()
+
+
+class PlainCache(main.ResponseCache):
+    """The cache as it was before page texts moved to the body store."""
+
+    def _compact(self, lang: str, value: dict) -> dict:
+        return value
+
+
+def wiki_text(title: str, chars: int, words: list[str], weights: list[float]) -> str:
+    """Article-like text: Zipf-distributed words, sentences and sections."""
+    paragraphs = []
+    size = 0
+    while size < chars:
+        sentences = []
+        for _ in range(random.randint(3, 8)):
+            sentence = " ".join(random.choices(words, weights, k=random.randint(6, 25)))
+            sentences.append(sentence.capitalize() + ".")
+        paragraph = " ".join(sentences)
+        if paragraphs and random.random() < 0.3:
+            heading = " ".join(random.choices(words, weights, k=2)).title()
+            paragraph = f"== {heading} ==\n{paragraph}"
+        paragraphs.append(paragraph)
+        size += len(paragraph)
+    return f"{title} is " + "\n\n".join(paragraphs)
+
+
+def deep_size(value, seen: set | None = None) -> int:
+    """Bytes held by `value` and everything it contains, each object once."""
+    seen = set() if seen is None else seen
+    if id(value) in seen:
+        return 0
+    seen.add(id(value))
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(deep_size(k, seen) + deep_size(v, seen) for k, v in value.items())
+    elif isinstance(value, (list, tuple)):
+        size += sum(deep_size(item, seen) for item in value)
+    return size
+
+
+def bench_storage(articles: int, chars: int):
+    """Memory per cached article (summary and content) before and after."""
+    random.seed(1)
+    letters = "etaoinshrdlcumwfgypbvkjxqz"
+    words = [
+        "".join(random.choices(letters, k=random.randint(2, 10))) for _ in range(5000)
+    ]
+    weights = [1 / rank for rank in range(1, len(words) + 1)]
+    texts = [wiki_text(f"Article {n}", chars, words, weights) for n in range(articles)]
+
+    print(f"{articles} articles, ~{chars} characters each, summary and content cached")
+    used = {}
+    for label, cache_type in (("plain", PlainCache), ("compact", main.ResponseCache)):
+        main.cache = cache_type(size=articles * 2, ttl=3600, path="")
+        for n, text in enumerate(texts):
+            title = f"Article {n}"
+            page = main.Page(title=title, url="", length=len(text), revision=n + 1)
+            intro = text.split("\n\n==", 1)[0]
+            for tool, field in (("summary", intro), ("content", text)):
+                cached = main.to_cached(dataclasses.replace(page, **{tool: field}))
+                main.cache.set(("en", title, tool), cached)
+        used[label] = deep_size(main.cache.memory) + deep_size(main.cache.bodies)
+        print(f"{label + ':':<9}{used[label] / articles:>10,.0f} bytes per article")
+
+        # Reading back must give the original texts
+        page = main.from_cached(main.cache.get(("en", "Article 0", "content")))
+        assert page.content == texts[0]
+    print(f"{used['plain'] / used['compact']:.1f}x smaller")
+
+
+async def bench_startup(runs: int):
+    """
+    Launch main.py over stdio the way an MCP client does, and time the
+    initialize response and the first list_tools answer from launch.
+    """
+    from mcp import ClientSession, StdioServerParameters
+    from mcp.client.stdio import stdio_client
+
+    # The warm-up after the handshake talks to the stand-in, not Wikipedia
+    mock = MockWikipedia().start()
+    env = {**os.environ, "WIKIPEDIA_API_URL": mock.url, "WIKIPEDIA_CACHE_PATH": ""}
+    server = StdioServerParameters(
+        command=sys.executable, args=[main.__file__], env=env
+    )
+    initialized, listed = [], []
+    with await main.run_blocking(open, os.devnull, "w") as logs:
+        for _ in range(runs):
+            started = time.perf_counter()
+            async with (
+                stdio_client(server, errlog=logs) as (read, write),
+                ClientSession(read, write) as session,
+            ):
+                await session.initialize()
+                initialized.append(time.perf_counter() - started)
+                await session.list_tools()
+                listed.append(time.perf_counter() - started)
+    mock.stop()
+
+    print(f"{runs} launches of {os.path.basename(main.__file__)} over stdio")
+    for label, times in (("initialize:", initialized), ("list_tools:", listed)):
+        print(
+            f"{label:<13}median {statistics.median(times) * 1000:6.0f}ms, "
+            f"max {max(times) * 1000:6.0f}ms"
+        )
+
+
+def read_call_log(path: str) -> list[dict]:
+    """The calls of a WIKIPEDIA_CALL_LOG file, oldest first."""
+    with open(path) as f:
+        calls = [json.loads(line) for line in f if line.strip()]
+    return sorted(calls, key=lambda call: call["at"])
+
+
+async def replay(
+    calls: list[dict], speed: float, concurrency: int
+) -> tuple[list[float], int, float]:
+    """
+    Send `calls` to the tool handlers, keeping their original spacing divided
+    by `speed`; with speed 0, back to back, `concurrency` at a time.
+    Returns each call's latency, the number of failed calls and the wall time.
+    """
+    times = []
+    failed = 0
+    limit = asyncio.Semaphore(concurrency if speed == 0 else len(calls))
+    started = time.perf_counter()
+
+    async def send(call: dict):
+        nonlocal failed
+        if speed > 0:
+            due = (call["at"] - calls[0]["at"]) / speed
+            await asyncio.sleep(due - (time.perf_counter() - started))
+        async with limit:
+            sent = time.perf_counter()
+            try:
+                result = await main.handle_call_tool(call["tool"], call["arguments"])
+                failed += any(
+                    block.text.split("\n", 1)[0].endswith(" Error") for block in result
+                )
+            except ValueError:
+                # Rejected, e.g. an unknown tool or bad arguments
+                failed += 1
+            times.append(time.perf_counter() - sent)
+
+    await asyncio.gather(*(send(call) for call in calls))
+    return times, failed, time.perf_counter() - started
+
+
+async def bench_replay(
+    path: str,
+    speed: float,
+    concurrency: int,
+    cache_sizes: list[int],
+    workers: list[int],
+    latency: float,
+):
+    """
+    Replay a call log against mock_api.py once per cache size and worker
+    count, to compare settings on the same traffic.
+    """
+    logging.getLogger().setLevel(logging.CRITICAL)
+    calls = read_call_log(path)
+    if not calls:
+        raise SystemExit(f"No calls in {path}")
+    span = calls[-1]["at"] - calls[0]["at"]
+    mock = MockWikipedia(latency=latency, every_title=True).start()
+    pace = f"{speed:g}x speed" if speed > 0 else f"{concurrency} at a time"
+    print(
+        f"{len(calls)} calls over {span:.1f}s from {path}, {pace}, "
+        f"upstream latency {latency * 1000:.0f}ms"
+    )
+    print(
+        f"{'cache':>7}{'workers':>9}{'calls/s':>9}{'p50 ms':>9}{'p95 ms':>9}"
+        f"{'p99 ms':>9}{'hit ratio':>11}{'upstream':>10}{'failed':>8}"
+    )
+    for cache_size in cache_sizes:
+        for count in workers:
+            use_mock_api(mock, cache_size=cache_size)
+            main.MAX_WORKERS = count
+            main.executor = ThreadPoolExecutor(max_workers=count)
+            before = sum(mock.requests.values())
+            times, failed, elapsed = await replay(calls, speed, concurrency)
+            main.executor.shutdown()
+            cuts = statistics.quantiles(times, n=100) if len(times) > 1 else times * 99
+            print(
+                f"{cache_size:>7}{count:>9}{len(times) / elapsed:>9.1f}"
+                f"{cuts[49] * 1000:>9.1f}{cuts[94] * 1000:>9.1f}{cuts[98] * 1000:>9.1f}"
+                f"{main.cache.snapshot()['hit_ratio']:>11.1%}"
+                f"{sum(mock.requests.values()) - before:>10}{failed:>8}"
+            )
+    mock.stop()
+
+
+def cli():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    concurrency = commands.add_parser(
+        "concurrency", help="N parallel summary calls vs. the slowest single call"
+    )
+    concurrency.add_argument(
+        "--calls",
+        type=int,
+        default=main.MAX_WORKERS,
+        help="Parallel calls (default: WIKIPEDIA_MAX_WORKERS)",
+    )
+    concurrency.add_argument(
+        "--latency", type=float, default=0.2, help="Slowest upstream latency (s)"
+    )
+
+    fallback = commands.add_parser(
+        "fallback", help="Simple English miss: sequential vs. hedged lookups"
+    )
+    fallback.add_argument(
+        "--latency", type=float, default=0.2, help="Upstream latency (s)"
+    )
+
+    batch = commands.add_parser(
+        "batch", help="N summary calls vs. one summary_batch call"
+    )
+    batch.add_argument("--titles", type=int, default=20)
+    batch.add_argument(
+        "--latency", type=float, default=0.2, help="Upstream latency (s)"
+    )
+
+    coalesce = commands.add_parser(
+        "coalesce", help="N identical concurrent calls share one upstream fetch"
+    )
+    coalesce.add_argument("--calls", type=int, default=100)
+    coalesce.add_argument(
+        "--latency", type=float, default=0.2, help="Upstream latency (s)"
+    )
+
+    load = commands.add_parser(
+        "load", help="Many MCP clients against one HTTP server: req/s, p50/p99"
+    )
+    load.add_argument(
+        "--transport", choices=["streamable-http", "sse"], default="streamable-http"
+    )
+    load.add_argument("--clients", type=int, default=20, help="Concurrent sessions")
+    load.add_argument("--calls", type=int, default=50, help="Calls per session")
+    load.add_argument("--titles", type=int, default=100, help="Distinct titles")
+    load.add_argument(
+        "--latency", type=float, default=0.05, help="Upstream latency (s)"
+    )
+
+    suite = commands.add_parser(
+        "suite", help="Every tool and fallback path against mock_api.py"
+    )
+    suite.add_argument("--iterations", type=int, default=50, help="Calls per path")
+    suite.add_argument(
+        "--latency", type=float, default=0.01, help="Upstream latency (s)"
+    )
+    suite.add_argument(
+        "--concurrency", type=int, default=main.MAX_WORKERS * 2, help="Parallel calls"
+    )
+
+    resilience = commands.add_parser(
+        "resilience", help="Retries, circuit breaker and stale answers vs. errors"
+    )
+    resilience.add_argument("--calls", type=int, default=100)
+    resilience.add_argument(
+        "--error-rate", type=float, default=0.2, help="Fraction of requests failing"
+    )
+    resilience.add_argument(
+        "--latency", type=float, default=0.01, help="Upstream latency (s)"
+    )
+
+    storage = commands.add_parser(
+        "storage", help="Memory per cached article: plain vs. compressed bodies"
+    )
+    storage.add_argument("--articles", type=int, default=200)
+    storage.add_argument(
+        "--chars", type=int, default=30000, help="Characters per article"
+    )
+
+    startup = commands.add_parser(
+        "startup", help="Time from launch to initialize and to first list_tools"
+    )
+    startup.add_argument("--runs", type=int, default=10)
+
+    replayed = commands.add_parser(
+        "replay", help="Replay a WIKIPEDIA_CALL_LOG file against mock_api.py"
+    )
+    replayed.add_argument("log", help="Call log (JSON lines)")
+    replayed.add_argument(
+        "--speed",
+        type=float,
+        default=1.0,
+        help="Times real speed; 0 for back to back (default: 1)",
+    )
+    replayed.add_argument(
+        "--concurrency", type=int, default=16, help="Calls at a time with --speed 0"
+    )
+    replayed.add_argument(
+        "--cache-size",
+        type=int,
+        nargs="+",
+        default=[main.CACHE_SIZE],
+        help="In-memory cache sizes to compare",
+    )
+    replayed.add_argument(
+        "--workers",
+        type=int,
+        nargs="+",
+        default=[main.MAX_WORKERS],
+        help="Worker pool sizes to compare",
+    )
+    replayed.add_argument(
+        "--latency", type=float, default=0.05, help="Upstream latency (s)"
+    )
+
+    args = parser.parse_args()
+    if args.command == "concurrency":
+        asyncio.run(bench_concurrency(args.calls, args.latency))
+    elif args.command == "fallback":
+        asyncio.run(bench_fallback(args.latency))
+    elif args.command == "batch":
+        asyncio.run(bench_batch(args.titles, args.latency))
+    elif args.command == "coalesce":
+        if not asyncio.run(bench_coalesce(args.calls, args.latency)):
+            raise SystemExit("FAIL: expected exactly one upstream fetch")
+    elif args.command == "suite":
+        if not asyncio.run(
+            bench_suite(args.iterations, args.latency, args.concurrency)
+        ):
+            raise SystemExit("FAIL: some answers were wrong")
+    elif args.command == "resilience":
+        asyncio.run(bench_resilience(args.calls, args.error_rate, args.latency))
+    elif args.command == "storage":
+        bench_storage(args.articles, args.chars)
+    elif args.command == "startup":
+        asyncio.run(bench_startup(args.runs))
+    elif args.command == "replay":
+        asyncio.run(
+            bench_replay(
+                args.log,
+                args.speed,
+                args.concurrency,
+                args.cache_size,
+                args.workers,
+                args.latency,
+            )
+        )
+    elif args.command == "load":
+        asyncio.run(
+            bench_load(
+                args.transport, args.clients, args.calls, args.titles, args.latency
+            )
+        )
+
+
+if __name__ == "__main__":
+    cli()
@@ -6,16 +6,45 @@ A Model Context Protocol server that provides access to Wikipedia content,
 prioritizing Simple English Wikipedia with fallback to regular English.
 """
 
+import argparse
 import asyncio
+import atexit
+import bisect
+import bz2
+import contextvars
+import difflib
+import functools
+import gzip
+import heapq
+import html
+import importlib
+import json
 import logging
+import mmap
 import os
-from typing import Any
+import random
+import re
+import sqlite3
+import threading
+import time
+import urllib.parse
+import zlib
+from collections import Counter, OrderedDict
+from collections.abc import Awaitable, Callable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from typing import TYPE_CHECKING, Any, Protocol
+from xml.etree import ElementTree
 
 import mcp.types as types
-import wikipedia
 from mcp.server import NotificationOptions, Server
+from mcp.server.lowlevel.helper_types import ReadResourceContents
 from mcp.server.models import InitializationOptions
 from mcp.types import Tool
+from pydantic import AnyUrl
+
+if TYPE_CHECKING:
+    import requests
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -29,6 +58,2128 @@ server = Server("wikipedia-se")
 WIKIPEDIA_MODE = os.environ.get("WIKIPEDIA_MODE", "simple").lower()
 USE_SIMPLE_FIRST = WIKIPEDIA_MODE != "full"
 
+# Or set WIKIPEDIA_LANGUAGES to any fallback chain of wikis, e.g.
+# "simple,en,de" or "de,en"; tools also take a per-request `languages` list.
+MAX_LANGUAGES = 8
+LANGUAGES = [
+    lang.strip().lower()
+    for lang in os.environ.get("WIKIPEDIA_LANGUAGES", "").split(",")
+    if lang.strip()
+]
+
+# Pages below these sizes are treated as stubs and the next language's page
+# is used instead (the last language's answer is always used).
+# `content` measures the plain text it already has, `summary` only fetches
+# the intro so it goes by the page source size.
+STUB_CONTENT_CHARS = int(os.environ.get("WIKIPEDIA_STUB_CHARS", "500"))
+STUB_PAGE_BYTES = int(os.environ.get("WIKIPEDIA_STUB_BYTES", "2000"))
+
+# Set WIKIPEDIA_HEDGED=true to request every language of the chain (and the
+# auto_suggest retries) at the same time instead of one after the other.
+# Fallbacks then cost about one round trip, at the price of extra requests
+# whose answers are thrown away.
+HEDGED = os.environ.get("WIKIPEDIA_HEDGED", "").lower() in ("1", "true", "yes")
+
+LANGUAGE_NAMES = {
+    "simple": "Simple English",
+    "en": "English",
+    "de": "German",
+    "es": "Spanish",
+    "fr": "French",
+}
+
+
+# The wikis a tool's `languages` list may name (every one gets a client with
+# its own connections, kept for the life of the process): by default the
+# named languages above and WIKIPEDIA_LANGUAGES, or WIKIPEDIA_ALLOWED_LANGUAGES.
+ALLOWED_LANGUAGES = frozenset(
+    [
+        lang.strip().lower()
+        for lang in os.environ.get("WIKIPEDIA_ALLOWED_LANGUAGES", "").split(",")
+        if lang.strip()
+    ]
+    or [*LANGUAGE_NAMES, *LANGUAGES]
+)
+
+
+def language_name(lang: str) -> str:
+    """A language's display name, or its code for wikis without one here."""
+    return LANGUAGE_NAMES.get(lang, lang)
+
+
+# Lookups are blocking HTTP calls, so they run on a bounded thread pool
+# instead of the event loop. WIKIPEDIA_MAX_WORKERS caps how many lookups can
+# be talking to Wikipedia at the same time (default: 8).
+MAX_WORKERS = max(1, int(os.environ.get("WIKIPEDIA_MAX_WORKERS", "8")))
+executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="wikipedia")
+# Cache I/O (SQLite reads and writes, zlib) has a small pool of its own, so
+# cached answers never queue behind lookups sleeping through retries
+cache_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="wikipedia-cache")
+
+# Seconds an HTTP server waits for open requests when asked to stop
+SHUTDOWN_GRACE = 10
+
+# MediaWiki API endpoint, with {lang} for the wiki. Point it at a mirror or at
+# mock_api.py with WIKIPEDIA_API_URL.
+API_URL = os.environ.get("WIKIPEDIA_API_URL", "https://{lang}.wikipedia.org/w/api.php")
+USER_AGENT = "mcp-se-wikipedia/0.1.0 (https://github.com/bhubbb/mcp-se-wikipedia)"
+
+
+@dataclass
+class Page:
+    """The parts of a Wikipedia page the tools return."""
+
+    title: str
+    url: str
+    length: int = 0  # size of the page source in bytes, from page info
+    content: str = ""
+    summary: str = ""
+    revision: int = 0  # latest revision ID, 0 when unknown
+
+
+# Lookup errors raised by the backends: a missing page, a disambiguation page
+# (with its options) or a timed-out request.
+class WikipediaException(Exception):
+    """Base class for errors from a Wikipedia backend."""
+
+
+class PageError(WikipediaException):
+    """No page matched the requested title."""
+
+    def __init__(self, title: str):
+        super().__init__(f'"{title}" does not match any pages')
+        self.title = title
+
+
+class DisambiguationError(WikipediaException):
+    """The title is a disambiguation page; `options` lists its links."""
+
+    def __init__(self, title: str, options: list[str]):
+        super().__init__(f'"{title}" may refer to: {", ".join(options)}')
+        self.title = title
+        self.options = options
+
+
+class HTTPTimeoutError(WikipediaException):
+    """The MediaWiki servers timed out answering `query`."""
+
+    def __init__(self, query: Any):
+        super().__init__(f"Request {query!r} timed out")
+        self.query = query
+
+
+# Upstream scheduling. Requests to each wiki are paced by a token bucket of
+# WIKIPEDIA_RATE_LIMIT requests/second (0 for no limit) that halves its rate
+# whenever Wikipedia throttles and creeps back up as requests succeed.
+# Throttled or failed requests are retried up to WIKIPEDIA_RETRIES times with
+# jittered exponential backoff, waiting at least as long as Retry-After says.
+# WIKIPEDIA_MAXLAG is sent as the maxlag parameter when set. After
+# BREAKER_FAILURES failed requests in a row a wiki's circuit opens: for
+# BREAKER_COOLDOWN seconds requests fail fast, and lookups are answered from
+# expired cache entries where there are any.
+RATE_LIMIT = max(0.0, float(os.environ.get("WIKIPEDIA_RATE_LIMIT", "50")))
+RETRIES = max(0, int(os.environ.get("WIKIPEDIA_RETRIES", "3")))
+MAXLAG = os.environ.get("WIKIPEDIA_MAXLAG", "")
+BACKOFF_BASE = 0.5
+BACKOFF_CAP = 30.0
+BREAKER_FAILURES = 5
+BREAKER_COOLDOWN = 30.0
+
+
+class UpstreamUnavailable(WikipediaException):
+    """Raised without a request while a wiki's circuit breaker is open."""
+
+    def __init__(self, lang: str, seconds: float):
+        super().__init__(
+            f"{language_name(lang)} Wikipedia is failing; "
+            f"not retrying for {seconds:.0f}s"
+        )
+
+
+class TokenBucket:
+    """
+    Paces requests to one host at `rate` per second, allowing bursts of the
+    same size. Throttling halves the rate; each success adds back 1% of it.
+    """
+
+    def __init__(self, rate: float):
+        self.max_rate = rate
+        self.rate = rate
+        self.tokens = max(1.0, rate)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """Wait for a token; returns the seconds waited."""
+        if not self.max_rate:
+            return 0.0
+        with self.lock:
+            now = time.monotonic()
+            burst = max(1.0, self.rate)
+            self.tokens = min(burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            # Take the token now and sleep off the debt, so waiters queue fairly
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+        if wait:
+            time.sleep(wait)
+        return wait
+
+    def throttled(self):
+        with self.lock:
+            self.rate = max(1.0, self.rate / 2) if self.max_rate else 0.0
+
+    def succeeded(self):
+        with self.lock:
+            self.rate = min(self.max_rate, self.rate + self.max_rate / 100)
+
+
+class CircuitBreaker:
+    """
+    Opens after `failures` failed requests in a row. While open, `allow`
+    refuses requests; after `cooldown` seconds one trial request is let
+    through, which closes the circuit if it succeeds or reopens it if not.
+    """
+
+    def __init__(self, failures: int, cooldown: float):
+        self.threshold = failures
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at: float | None = None
+        self.lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self.lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at >= self.cooldown:
+                self.opened_at = time.monotonic()  # the others keep failing fast
+                return True
+            return False
+
+    def remaining(self) -> float:
+        with self.lock:
+            if self.opened_at is None:
+                return 0.0
+            return max(0.0, self.cooldown - (time.monotonic() - self.opened_at))
+
+    def record(self, ok: bool) -> bool:
+        """Count a request's outcome; returns True when this opens the circuit."""
+        with self.lock:
+            if ok:
+                self.failures = 0
+                self.opened_at = None
+                return False
+            self.failures += 1
+            if self.failures >= self.threshold:
+                opening = self.opened_at is None
+                self.opened_at = time.monotonic()
+                return opening
+            return False
+
+
+def retry_after(response: "requests.Response") -> float | None:
+    """The Retry-After header in seconds, if it is given as a number."""
+    try:
+        return min(BACKOFF_CAP, float(response.headers["Retry-After"]))
+    except (KeyError, ValueError):
+        return None
+
+
+class Backend(Protocol):
+    """
+    Where one language's pages come from: the live API (WikipediaClient) or
+    a local dump index (OfflineClient). Methods are blocking; the async
+    layer runs them on the worker pool.
+
+    Missing pages raise PageError and disambiguation pages raise
+    DisambiguationError with the options.
+    """
+
+    lang: str
+
+    def search(self, query: str, limit: int = 10) -> list[str]: ...
+
+    def search_snippets(self, query: str, limit: int = 10) -> list[dict[str, Any]]: ...
+
+    def suggest(self, query: str) -> str: ...
+
+    def page(
+        self,
+        title: str,
+        auto_suggest: bool = False,
+        summary: bool = False,
+        content: bool = False,
+    ) -> Page: ...
+
+    def pages(
+        self, titles: list[str], summary: bool = False
+    ) -> dict[str, Page | WikipediaException]: ...
+
+
+class WikipediaClient:
+    """
+    MediaWiki API client bound to a single language.
+
+    Each client owns a pooled HTTP session, so handlers pick a client per
+    request instead of switching the process-wide `wikipedia.set_lang`.
+    requests is imported on first use, keeping it off the startup path.
+    """
+
+    def __init__(self, lang: str):
+        import requests
+
+        self.lang = lang
+        self.api_url = API_URL.format(lang=lang)
+        self.session = requests.Session()
+        self.session.headers["User-Agent"] = USER_AGENT
+        adapter = requests.adapters.HTTPAdapter(pool_maxsize=MAX_WORKERS)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.bucket = TokenBucket(RATE_LIMIT)
+        self.breaker = CircuitBreaker(BREAKER_FAILURES, BREAKER_COOLDOWN)
+
+    def request(self, **params: Any) -> dict:
+        """
+        Make one API request and return the decoded JSON, pacing it and
+        retrying throttled or failed attempts (see RATE_LIMIT above).
+        """
+        params = {"action": "query", "format": "json", "formatversion": 2, **params}
+        if MAXLAG:
+            params["maxlag"] = MAXLAG
+        if not self.breaker.allow():
+            metrics.inc("wikipedia_http_requests_total", lang=self.lang, status="open")
+            raise UpstreamUnavailable(self.lang, self.breaker.remaining())
+
+        for attempt in range(RETRIES + 1):
+            waited = self.bucket.acquire()
+            if waited:
+                metrics.inc(
+                    "wikipedia_rate_limit_wait_seconds_total", waited, lang=self.lang
+                )
+            # Errors not worth retrying (e.g. a 404 or an HTML page instead
+            # of JSON) propagate from here, leaving the breaker as it was:
+            # they show neither that the wiki is healthy nor that it is down
+            data, failure, delay = self.attempt(params)
+            if failure is None:
+                self.breaker.record(True)
+                self.bucket.succeeded()
+                return data
+            if attempt == RETRIES:
+                break
+            reason = type(failure).__name__
+            metrics.inc(
+                "wikipedia_upstream_retries_total", lang=self.lang, reason=reason
+            )
+            # Full jitter, but never sooner than the server asked for
+            backoff = random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2**attempt))
+            time.sleep(max(delay or 0.0, backoff))
+
+        if self.breaker.record(False):
+            metrics.inc("wikipedia_circuit_opened_total", lang=self.lang)
+            logger.warning(
+                f"{language_name(self.lang)} Wikipedia circuit open "
+                f"for {BREAKER_COOLDOWN:.0f}s after {BREAKER_FAILURES} failures"
+            )
+        raise failure
+
+    def attempt(
+        self, params: dict
+    ) -> tuple[dict | None, Exception | None, float | None]:
+        """
+        One HTTP request. Returns (data, None, None) on success, or
+        (None, error, Retry-After) when the attempt should be retried;
+        errors that retrying won't fix are raised.
+        """
+        import requests
+
+        try:
+            response = self.session.get(self.api_url, params=params, timeout=30)
+        except requests.RequestException as e:
+            metrics.inc("wikipedia_http_requests_total", lang=self.lang, status="error")
+            return None, e, None
+        metrics.inc(
+            "wikipedia_http_requests_total",
+            lang=self.lang,
+            status=str(response.status_code),
+        )
+        if response.status_code == 429 or response.status_code >= 500:
+            if response.status_code in (429, 503):
+                self.bucket.throttled()
+            error = requests.HTTPError(
+                f"{response.status_code} from {self.api_url}", response=response
+            )
+            return None, error, retry_after(response)
+        response.raise_for_status()
+
+        data = response.json()
+        if "error" in data:
+            code = data["error"].get("code", "")
+            info = data["error"].get("info", "")
+            if code in ("maxlag", "ratelimited"):
+                self.bucket.throttled()
+                error = WikipediaException(info)
+                return None, error, retry_after(response) or 5.0
+            if info in ("HTTP request timed out.", "Pool queue is full"):
+                return None, HTTPTimeoutError(params), None
+            raise WikipediaException(info)
+        return data, None, None
+
+    def search(self, query: str, limit: int = 10) -> list[str]:
+        """Return the titles of pages matching `query`."""
+        data = self.request(list="search", srsearch=query, srlimit=limit, srprop="")
+        return [result["title"] for result in data["query"]["search"]]
+
+    def search_snippets(self, query: str, limit: int = 10) -> list[dict[str, Any]]:
+        """
+        Search and return each hit's title, URL, page size and the first
+        sentences of its intro, all from one generator query.
+        """
+        data = self.request(
+            generator="search",
+            gsrsearch=query,
+            gsrlimit=limit,
+            prop="info|extracts",
+            inprop="url",
+            explaintext=1,
+            exintro=1,
+            exsentences=2,
+            exlimit="max",
+        )
+        pages = sorted(data.get("query", {}).get("pages", []), key=lambda p: p["index"])
+        return [
+            {
+                "title": page["title"],
+                "url": page["fullurl"],
+                "length": page["length"],
+                "extract": " ".join(page.get("extract", "").split()),
+            }
+            for page in pages
+        ]
+
+    def suggest(self, query: str) -> str:
+        """Return the title `wikipedia.page(auto_suggest=True)` would pick."""
+        data = self.request(
+            list="search", srsearch=query, srlimit=1, srprop="", srinfo="suggestion"
+        )
+        query_data = data["query"]
+        suggestion = query_data.get("searchinfo", {}).get("suggestion")
+        if suggestion:
+            return suggestion
+        if query_data["search"]:
+            return query_data["search"][0]["title"]
+        raise PageError(query)
+
+    def page(
+        self,
+        title: str,
+        auto_suggest: bool = False,
+        summary: bool = False,
+        content: bool = False,
+    ) -> Page:
+        """
+        Load a page, following redirects.
+        Page info and one extract (the intro for `summary`, the full text for
+        `content`) come back in a single request.
+        """
+        if auto_suggest:
+            title = self.suggest(title)
+
+        params = {
+            "prop": "info|pageprops",
+            "inprop": "url",
+            "ppprop": "disambiguation",
+            "redirects": 1,
+            "titles": title,
+        }
+        if summary or content:
+            params["prop"] += "|extracts"
+            params["explaintext"] = 1
+            if not content:
+                params["exintro"] = 1
+        data = self.request(**params)["query"]["pages"][0]
+        return self._page_from(data, title, summary, content)
+
+    def pages(
+        self, titles: list[str], summary: bool = False
+    ) -> dict[str, Page | WikipediaException]:
+        """
+        Load many pages with multi-title queries, following redirects.
+
+        Returns a Page (with the intro if `summary`), PageError or
+        DisambiguationError for every requested title. Intro extracts are
+        limited to 20 pages per request, page info to 50.
+        """
+        results = {}
+        batch_size = 20 if summary else 50
+        for start in range(0, len(titles), batch_size):
+            batch = titles[start : start + batch_size]
+            params = {
+                "prop": "info|pageprops",
+                "inprop": "url",
+                "ppprop": "disambiguation",
+                "redirects": 1,
+                "titles": "|".join(batch),
+            }
+            if summary:
+                params.update(
+                    prop="info|pageprops|extracts",
+                    explaintext=1,
+                    exintro=1,
+                    exlimit="max",
+                )
+            data = self.request(**params)
+            query = data["query"]
+            pages = {page["title"]: page for page in query["pages"] if "title" in page}
+
+            # Long responses are split; later parts only carry the missing extracts
+            while "continue" in data:
+                data = self.request(**params, **data["continue"])
+                for page in data["query"]["pages"]:
+                    if "extract" in page and page.get("title") in pages:
+                        pages[page["title"]]["extract"] = page["extract"]
+
+            renamed = {
+                item["from"]: item["to"]
+                for item in query.get("normalized", []) + query.get("redirects", [])
+            }
+            for title in batch:
+                target = title
+                for _ in range(3):  # normalised, then redirected
+                    target = renamed.get(target, target)
+                try:
+                    results[title] = self._page_from(
+                        pages.get(target, {"missing": True}), title, summary, False
+                    )
+                except (PageError, DisambiguationError) as e:
+                    results[title] = e
+        return results
+
+    def _page_from(self, data: dict, title: str, summary: bool, content: bool) -> Page:
+        """Build a Page from one entry of a query's `pages` list."""
+        if data.get("missing") or data.get("invalid"):
+            raise PageError(title)
+        if "disambiguation" in data.get("pageprops", {}):
+            raise DisambiguationError(
+                data["title"], self.disambiguation_options(data["title"])
+            )
+
+        page = Page(
+            title=data["title"],
+            url=data["fullurl"],
+            length=data["length"],
+            revision=data.get("lastrevid", 0),
+        )
+        if content:
+            page.content = data.get("extract", "")
+        elif summary:
+            page.summary = data.get("extract", "")
+        return page
+
+    def disambiguation_options(self, title: str) -> list[str]:
+        """List the link texts of a disambiguation page, in page order."""
+        from bs4 import BeautifulSoup
+
+        html = self.request(action="parse", page=title, prop="text")["parse"]["text"]
+        items = BeautifulSoup(html, "html.parser").find_all("li")
+        return [
+            item.a.get_text()
+            for item in items
+            if item.a and "tocsection" not in "".join(item.get("class", []))
+        ]
+
+
+# Response cache: a size-bounded in-memory LRU in front of a SQLite file that
+# survives restarts. WIKIPEDIA_CACHE_SIZE is the number of entries kept in
+# memory, WIKIPEDIA_CACHE_TTL how long an entry stays fresh (seconds) and
+# WIKIPEDIA_CACHE_PATH where the SQLite file lives (empty to disable it).
+CACHE_SIZE = max(0, int(os.environ.get("WIKIPEDIA_CACHE_SIZE", "512")))
+CACHE_TTL = float(os.environ.get("WIKIPEDIA_CACHE_TTL", "86400"))
+# How long expired entries stay on disk to be served while Wikipedia is down
+CACHE_STALE = float(os.environ.get("WIKIPEDIA_CACHE_STALE", "604800"))
+# Entries expired for longer than that are dropped at startup and then every
+# WIKIPEDIA_CACHE_PRUNE seconds
+CACHE_PRUNE_INTERVAL = float(os.environ.get("WIKIPEDIA_CACHE_PRUNE", "3600"))
+# Rows deleted per transaction when pruning
+PRUNE_BATCH = 1000
+# Entries read at least HOT_HITS times are refreshed in the background once
+# they are within WIKIPEDIA_CACHE_REFRESH seconds of expiring (default: the
+# last tenth of the TTL), so popular pages never make a caller wait.
+CACHE_REFRESH = float(os.environ.get("WIKIPEDIA_CACHE_REFRESH", str(CACHE_TTL / 10)))
+HOT_HITS = 2
+# Load the N most read pages into the cache in the background at startup
+PREWARM_TOP = max(0, int(os.environ.get("WIKIPEDIA_PREWARM", "0")))
+CACHE_PATH = os.environ.get(
+    "WIKIPEDIA_CACHE_PATH",
+    os.path.join(
+        os.environ.get("XDG_CACHE_HOME", os.path.expanduser("~/.cache")),
+        "mcp-se-wikipedia",
+        "cache.sqlite3",
+    ),
+)
+
+
+class ResponseCache:
+    """
+    Two-tier cache for lookup results, keyed by (language, title, tool).
+
+    Values are JSON-serialisable dicts. Memory hits are served from an LRU,
+    misses fall through to SQLite and are promoted back into memory.
+    Page reads are counted per key and flushed to SQLite, so the most
+    requested pages can be prewarmed after a restart.
+
+    Page texts are stored apart from the entries, zlib-compressed, once per
+    revision (see put_body). Entries refer to them by a "body" id; a body
+    stays in memory while a memory entry refers to it.
+
+    `lock` guards the in-memory state only, so memory hits on the event loop
+    never wait for SQLite or zlib. `db_lock` guards the SQLite connection
+    and the body store; an entry and its body are written under it together.
+    """
+
+    def __init__(self, size: int, ttl: float, path: str, refresh: float = 0.0):
+        self.size = size
+        self.ttl = ttl
+        self.refresh = refresh
+        self.path = path
+        # Reads not yet flushed to SQLite (all of them without a file), and
+        # reads of the keys in memory, for ageing
+        self.access = Counter()
+        self.pending = 0
+        self.hits = Counter()
+        self.bodies: dict[str, bytes] = {}
+        self.body_refs = Counter()
+        self.memory: OrderedDict[tuple[str, str, str], tuple[float, dict]] = (
+            OrderedDict()
+        )
+        self.stats = Counter()
+        self.lock = threading.Lock()
+        self.db_lock = threading.Lock()
+        self.db = None
+        if path:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            self.db = sqlite3.connect(path, check_same_thread=False)
+            self.db.execute("PRAGMA journal_mode=WAL")
+            self.db.execute("PRAGMA synchronous=NORMAL")
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "lang TEXT, title TEXT, tool TEXT, expires REAL, value TEXT, "
+                "PRIMARY KEY (lang, title, tool))"
+            )
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS access ("
+                "lang TEXT, title TEXT, tool TEXT, hits INTEGER, last REAL, "
+                "PRIMARY KEY (lang, title, tool))"
+            )
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS bodies (id TEXT PRIMARY KEY, data BLOB)"
+            )
+            # For prune: expired entries, and whether any entry uses a body
+            self.db.execute(
+                "CREATE INDEX IF NOT EXISTS responses_expires ON responses (expires)"
+            )
+            self.db.execute(
+                "CREATE INDEX IF NOT EXISTS responses_body "
+                "ON responses (json_extract(value, '$.page.body'))"
+            )
+            self.db.commit()
+            atexit.register(self.flush_access)
+
+    def prune(self):
+        """
+        Drop entries expired for longer than CACHE_STALE, and the bodies no
+        entry uses any more. Goes through the whole file, so it runs in the
+        background, at startup and every CACHE_PRUNE_INTERVAL seconds, and
+        in batches of PRUNE_BATCH rows, so lookups that need SQLite meanwhile
+        wait for one batch at most.
+        """
+        if self.db is None:
+            return
+        # Expired entries are kept a while to answer from during outages
+        cutoff = time.time() - CACHE_STALE
+        deleted = PRUNE_BATCH
+        while deleted == PRUNE_BATCH:
+            with self.db_lock:
+                deleted = self.db.execute(
+                    "DELETE FROM responses WHERE rowid IN (SELECT rowid "
+                    "FROM responses WHERE expires < ? LIMIT ?)",
+                    (cutoff, PRUNE_BATCH),
+                ).rowcount
+                self.db.commit()
+        last = 0
+        while last is not None:
+            with self.db_lock:
+                end = self.db.execute(
+                    "SELECT max(rowid) FROM (SELECT rowid FROM bodies "
+                    "WHERE rowid > ? ORDER BY rowid LIMIT ?)",
+                    (last, PRUNE_BATCH),
+                ).fetchone()[0]
+                # The + drops bodies.id's column affinity, without which
+                # SQLite won't use responses_body for the comparison
+                self.db.execute(
+                    "DELETE FROM bodies WHERE rowid > ? AND rowid <= ? AND NOT "
+                    "EXISTS (SELECT 1 FROM responses WHERE "
+                    "json_extract(value, '$.page.body') = +bodies.id)",
+                    (last, end),
+                )
+                self.db.commit()
+            last = end
+
+    def get(self, key: tuple[str, str, str]) -> dict | None:
+        """Return the cached value for `key`, or None on a miss."""
+        value = self.get_memory(key)
+        return value if value is not None else self.get_disk(key)
+
+    def get_memory(self, key: tuple[str, str, str]) -> dict | None:
+        """The memory half of get: never blocks, so it runs on the event loop."""
+        with self.lock:
+            entry = self.memory.get(key)
+            if entry is not None:
+                if entry[0] > time.time():
+                    self.memory.move_to_end(key)
+                    self.stats["memory_hits"] += 1
+                    return entry[1]
+                # Left in place until evicted, for get_stale
+                self.stats["expirations"] += 1
+        return None
+
+    def get_disk(self, key: tuple[str, str, str]) -> dict | None:
+        """The SQLite half of get, counting the miss if that fails too."""
+        row = None
+        if self.db is not None:
+            with self.db_lock:
+                row = self.db.execute(
+                    "SELECT expires, value FROM responses "
+                    "WHERE lang = ? AND title = ? AND tool = ? AND expires > ?",
+                    (*key, time.time()),
+                ).fetchone()
+                if row is not None:
+                    value = json.loads(row[1])
+                    stored = self._body_data(value)
+        with self.lock:
+            if row is None:
+                self.stats["misses"] += 1
+                return None
+            self._remember(key, row[0], value, stored)
+            self.stats["disk_hits"] += 1
+            return value
+
+    def ageing(self, key: tuple[str, str, str]) -> bool:
+        """Whether `key` is hot and close enough to expiring to refresh now."""
+        with self.lock:
+            entry = self.memory.get(key)
+            return (
+                entry is not None
+                and self.hits[key] >= HOT_HITS
+                and 0 < entry[0] - time.time() <= self.refresh
+            )
+
+    def record_access(self, key: tuple[str, str, str]) -> bool:
+        """
+        Count a read of `key`. Returns True every 100 reads, when the counts
+        should be written to SQLite with flush_access.
+        """
+        with self.lock:
+            self.access[key] += 1
+            self.pending += 1
+            if self.size:
+                self.hits[key] += 1
+                if len(self.hits) > 2 * self.size:
+                    # Drop the keys that were read but never kept in memory
+                    self.hits = Counter(
+                        {
+                            read: n
+                            for read, n in self.hits.items()
+                            if read in self.memory
+                        }
+                    )
+            return self.pending >= 100 and self.db is not None
+
+    def flush_access(self):
+        """Write the read counts gathered since the last flush to SQLite."""
+        if self.db is None:
+            return
+        with self.lock:
+            access, self.access, self.pending = self.access, Counter(), 0
+        if not access:
+            return
+        now = time.time()
+        with self.db_lock:
+            self.db.executemany(
+                "INSERT INTO access VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (lang, title, tool) DO UPDATE SET "
+                "hits = hits + excluded.hits, last = excluded.last",
+                [(*key, hits, now) for key, hits in access.items()],
+            )
+            self.db.commit()
+
+    def top(self, n: int) -> list[tuple[str, str, str]]:
+        """The `n` most read keys, across restarts when there is a SQLite file."""
+        if self.db is None:
+            with self.lock:
+                return [key for key, _ in self.access.most_common(n)]
+        self.flush_access()
+        with self.db_lock:
+            rows = self.db.execute(
+                "SELECT lang, title, tool FROM access "
+                "ORDER BY hits DESC, last DESC LIMIT ?",
+                (n,),
+            ).fetchall()
+        return [tuple(row) for row in rows]
+
+    def get_stale(self, key: tuple[str, str, str]) -> dict | None:
+        """Return the value for `key` even if it has expired, or None."""
+        with self.lock:
+            entry = self.memory.get(key)
+            if entry is not None:
+                return entry[1]
+        if self.db is not None:
+            with self.db_lock:
+                row = self.db.execute(
+                    "SELECT value FROM responses "
+                    "WHERE lang = ? AND title = ? AND tool = ?",
+                    key,
+                ).fetchone()
+            if row is not None:
+                return json.loads(row[0])
+        return None
+
+    def set(self, key: tuple[str, str, str], value: dict):
+        """Store `value` in memory and on disk, with any page text as a body."""
+        if not self.size and self.db is None:
+            return
+        expires = time.time() + self.ttl
+        # The body and the entry referring to it go in together, so neither
+        # another store of the same text nor prune can come in between
+        with self.db_lock:
+            value = self._compact(key[0], value)
+            stored = self._body_data(value)
+            if self.db is not None:
+                self.db.execute(
+                    "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)",
+                    (*key, expires, json.dumps(value)),
+                )
+                self.db.commit()
+        with self.lock:
+            self._remember(key, expires, value, stored)
+
+    def _body_data(self, value: dict) -> bytes | None:
+        """The stored body of a value kept in memory; called under db_lock."""
+        body = value.get("page", {}).get("body")
+        if body is None or not self.size:
+            return None
+        return self.bodies.get(body) or self._disk_body(body)
+
+    def _remember(
+        self,
+        key: tuple[str, str, str],
+        expires: float,
+        value: dict,
+        stored: bytes | None,
+    ):
+        if not self.size:
+            return
+        body = value.get("page", {}).get("body")
+        if body is not None:
+            if stored is not None:
+                self.bodies[body] = stored
+            self.body_refs[body] += 1
+        previous = self.memory.get(key)
+        self.memory[key] = (expires, value)
+        self.memory.move_to_end(key)
+        if previous is not None:
+            self._release(previous[1])
+        while len(self.memory) > self.size:
+            evicted_key, (_, evicted) = self.memory.popitem(last=False)
+            self.hits.pop(evicted_key, None)
+            self._release(evicted)
+            self.stats["evictions"] += 1
+
+    def _release(self, value: dict):
+        body = value.get("page", {}).get("body")
+        if body is not None:
+            self.body_refs[body] -= 1
+            if self.body_refs[body] <= 0:
+                del self.body_refs[body]
+                self.bodies.pop(body, None)
+
+    def _disk_body(self, body: str) -> bytes | None:
+        """A body from SQLite; called under db_lock."""
+        if self.db is None:
+            return None
+        row = self.db.execute(
+            "SELECT data FROM bodies WHERE id = ?", (body,)
+        ).fetchone()
+        return row[0] if row is not None else None
+
+    def _compact(self, lang: str, value: dict) -> dict:
+        """Move a page's text out of `value` into the body store."""
+        page = value.get("page")
+        if page is None or "body" in page:
+            return value
+        field = "content" if page.get("content") else "summary"
+        text = page.get(field)
+        if not text:
+            return value
+        page = {k: v for k, v in page.items() if k not in ("content", "summary")}
+        page.update(
+            self.put_body(lang, page.get("revision", 0), page["title"], text),
+            field=field,
+        )
+        return {"page": page}
+
+    def put_body(
+        self, lang: str, revision: int, title: str, text: str
+    ) -> dict[str, Any]:
+        """
+        Store a page text once and return the reference to keep in its entry.
+        Called under db_lock, which keeps the check of the stored text and
+        the write of a longer one together; the caller commits.
+
+        Texts are keyed by revision. A summary's intro is the start of the
+        full text, so whichever of the two is longer is kept and the other
+        is read back as a prefix of it; a text that doesn't fit the stored
+        one (e.g. the revision is unknown and the page changed) gets a body
+        of its own.
+        """
+        data = text.encode()
+        base = f"{lang}/{revision or normalize_title(title)}"
+        for body in (base, f"{base}/{zlib.crc32(data):08x}"):
+            stored = self.bodies.get(body) or self._disk_body(body)
+            old = zlib.decompress(stored) if stored else b""
+            if old.startswith(data):
+                return {"body": body, "bytes": len(data)}
+            if data.startswith(old):
+                break
+        # A new text, a longer one for the same revision, or a clash
+        compressed = zlib.compress(data, 6)
+        with self.lock:
+            if body in self.bodies or self.size:
+                self.bodies[body] = compressed
+        if self.db is not None:
+            self.db.execute(
+                "INSERT OR REPLACE INTO bodies VALUES (?, ?)", (body, compressed)
+            )
+        return {"body": body, "bytes": len(data)}
+
+    def read_body(self, body: str, size: int) -> str:
+        """The first `size` bytes of a stored text, decompressing only those."""
+        with self.lock:
+            data = self.bodies.get(body)
+        if data is None:
+            with self.db_lock:
+                data = self._disk_body(body)
+        if data is None:
+            return ""
+        return zlib.decompressobj().decompress(data, size).decode(errors="ignore")
+
+    def snapshot(self) -> dict[str, Any]:
+        """Counters for sizing the cache."""
+        with self.lock:
+            stats = {
+                "memory_entries": len(self.memory),
+                "memory_size": self.size,
+                "ttl_seconds": self.ttl,
+                "disk_path": self.path or None,
+                "memory_hits": self.stats["memory_hits"],
+                "disk_hits": self.stats["disk_hits"],
+                "misses": self.stats["misses"],
+                "evictions": self.stats["evictions"],
+                "expirations": self.stats["expirations"],
+                "bodies": len(self.bodies),
+                "body_bytes": sum(len(data) for data in self.bodies.values()),
+            }
+        if self.db is not None:
+            with self.db_lock:
+                stats["disk_entries"] = self.db.execute(
+                    "SELECT COUNT(*) FROM responses"
+                ).fetchone()[0]
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_ratio"] = (lookups - stats["misses"]) / lookups if lookups else 0.0
+        return stats
+
+
+cache = ResponseCache(CACHE_SIZE, CACHE_TTL, CACHE_PATH, CACHE_REFRESH)
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key into one.
+
+    The first caller runs the fetch; everyone asking for the same key while
+    it is in flight waits for that fetch and gets its result or its error.
+    """
+
+    def __init__(self):
+        self.flights: dict[tuple, asyncio.Future] = {}
+        self.stats = Counter()
+
+    async def do(self, key: tuple, fetch: Callable[[], Awaitable[Any]]) -> Any:
+        flight = self.flights.get(key)
+        if flight is None:
+            self.stats["fetches"] += 1
+            flight = asyncio.ensure_future(fetch())
+            self.flights[key] = flight
+            flight.add_done_callback(lambda done: self._land(key, done))
+        else:
+            self.stats["coalesced"] += 1
+        # One caller giving up (e.g. a cancelled hedge) must not cancel the rest
+        return await asyncio.shield(flight)
+
+    def _land(self, key: tuple, flight: asyncio.Future):
+        self.flights.pop(key, None)
+        # Retrieve the error so it isn't reported when every caller is gone
+        if not flight.cancelled():
+            flight.exception()
+
+    def snapshot(self) -> dict[str, int]:
+        """How many fetches ran and how many calls shared one instead."""
+        return {
+            "fetches": self.stats["fetches"],
+            "coalesced": self.stats["coalesced"],
+            "in_flight": len(self.flights),
+        }
+
+
+inflight = SingleFlight()
+
+
+# Metrics: counters and latency histograms for tools, per-language lookups
+# and upstream calls, served as Prometheus text at /metrics (HTTP transports)
+# and as the wikipedia://stats/metrics resource. WIKIPEDIA_METRICS_LOG logs a
+# JSON snapshot every that many seconds; WIKIPEDIA_TRACE=1 logs one JSON line
+# per tool call with a span for every lookup stage. WIKIPEDIA_CALL_LOG appends
+# one compact JSON line per tool call to a file (time, tool, arguments,
+# languages served, cache hits and misses, latency), which
+# `bench.py replay` plays back against mock_api.py.
+METRICS_LOG_INTERVAL = float(os.environ.get("WIKIPEDIA_METRICS_LOG", "0"))
+TRACE = os.environ.get("WIKIPEDIA_TRACE", "").lower() in ("1", "true", "yes")
+CALL_LOG = os.environ.get("WIKIPEDIA_CALL_LOG", "")
+
+
+class Metrics:
+    """Labelled counters and histograms, rendered in the Prometheus text format."""
+
+    BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters: dict[str, Counter] = {}
+        # name -> labels -> cumulative bucket counts, then sum and count
+        self.histograms: dict[str, dict[tuple, list[float]]] = {}
+
+    def inc(self, name: str, amount: float = 1, **labels: str):
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            self.counters.setdefault(name, Counter())[key] += amount
+
+    def observe(self, name: str, value: float, **labels: str):
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            series = self.histograms.setdefault(name, {}).setdefault(
+                key, [0] * (len(self.BUCKETS) + 2)
+            )
+            for position, bound in enumerate(self.BUCKETS):
+                if value <= bound:
+                    series[position] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> str:
+        """All series in the Prometheus text exposition format."""
+        lines = []
+        with self.lock:
+            for name, series in sorted(self.counters.items()):
+                lines.append(f"# TYPE {name} counter")
+                for key, value in sorted(series.items()):
+                    lines.append(f"{name}{format_labels(key)} {value:g}")
+            for name, series in sorted(self.histograms.items()):
+                lines.append(f"# TYPE {name} histogram")
+                for key, values in sorted(series.items()):
+                    bounds = [f"{bound:g}" for bound in self.BUCKETS] + ["+Inf"]
+                    counts = values[: len(self.BUCKETS)] + [values[-1]]
+                    for bound, count in zip(bounds, counts):
+                        labels = format_labels(key + (("le", bound),))
+                        lines.append(f"{name}_bucket{labels} {count:g}")
+                    lines.append(f"{name}_sum{format_labels(key)} {values[-2]:g}")
+                    lines.append(f"{name}_count{format_labels(key)} {values[-1]:g}")
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self) -> dict[str, Any]:
+        """Counters, and count/mean of every histogram, keyed by series name."""
+        with self.lock:
+            stats = {
+                f"{name}{format_labels(key)}": value
+                for name, series in self.counters.items()
+                for key, value in series.items()
+            }
+            for name, series in self.histograms.items():
+                for key, values in series.items():
+                    stats[f"{name}{format_labels(key)}"] = {
+                        "count": values[-1],
+                        "mean_seconds": round(values[-2] / values[-1], 4),
+                    }
+        return stats
+
+
+def format_labels(key: tuple) -> str:
+    if not key:
+        return ""
+    escape = str.maketrans({"\\": "\\\\", '"': '\\"', "\n": "\\n"})
+    return "{" + ",".join(f'{k}="{str(v).translate(escape)}"' for k, v in key) + "}"
+
+
+metrics = Metrics()
+trace_spans: contextvars.ContextVar[list | None] = contextvars.ContextVar(
+    "trace_spans", default=None
+)
+# Off while prewarming, so warming a page doesn't make it look popular
+recording_access: contextvars.ContextVar[bool] = contextvars.ContextVar(
+    "recording_access", default=True
+)
+
+
+def metrics_text() -> str:
+    """Prometheus text for the metrics plus the cache and single-flight counters."""
+    lines = [metrics.render().rstrip("\n")]
+    stats = cache.snapshot()
+    lines.append("# TYPE wikipedia_cache_events_total counter")
+    for event in ("memory_hits", "disk_hits", "misses", "evictions", "expirations"):
+        lines.append(f'wikipedia_cache_events_total{{event="{event}"}} {stats[event]}')
+    lines.append("# TYPE wikipedia_cache_memory_entries gauge")
+    lines.append(f"wikipedia_cache_memory_entries {stats['memory_entries']}")
+    flights = inflight.snapshot()
+    lines.append("# TYPE wikipedia_single_flight_coalesced_total counter")
+    lines.append(f"wikipedia_single_flight_coalesced_total {flights['coalesced']}")
+    return "\n".join(line for line in lines if line) + "\n"
+
+
+def add_span(span: dict[str, Any]):
+    """Record a stage of the current tool call, when tracing."""
+    spans = trace_spans.get()
+    if spans is not None:
+        spans.append(span)
+
+
+def log_call(entry: dict[str, Any]):
+    """Append one tool call to WIKIPEDIA_CALL_LOG."""
+    with open(os.path.expanduser(CALL_LOG), "a") as log:
+        log.write(json.dumps(entry, separators=(",", ":")) + "\n")
+
+
+def call_entry(
+    name: str,
+    arguments: dict[str, Any],
+    status: str,
+    started: float,
+    elapsed: float,
+    spans: list[dict[str, Any]],
+) -> dict[str, Any]:
+    """The call log line for a finished tool call, from its trace spans."""
+    sources = Counter(span["source"] for span in spans if "source" in span)
+    return {
+        "at": round(started, 3),
+        "tool": name,
+        "arguments": arguments,
+        "status": status,
+        "langs": [span["lang"] for span in spans if span["stage"] == "served"],
+        "hits": sources["cache"],
+        "misses": sources["upstream"] + sources["coalesced"],
+        "ms": round(elapsed * 1000, 1),
+    }
+
+
+async def prune_cache(interval: float):
+    """Prune the SQLite cache now and then every `interval` seconds."""
+    while True:
+        try:
+            await run_cache_io(cache.prune)
+        except sqlite3.Error as e:
+            logger.warning(f"Cache prune failed: {e}")
+        if interval <= 0:
+            return
+        await asyncio.sleep(interval)
+
+
+async def log_metrics(interval: float):
+    """Log a JSON metrics snapshot every `interval` seconds."""
+    while True:
+        await asyncio.sleep(interval)
+        logger.info(f"metrics {json.dumps(metrics.snapshot(), sort_keys=True)}")
+
+
+def normalize_title(title: str) -> str:
+    """Normalise a title the way MediaWiki does: spaces, first letter upper."""
+    title = " ".join(title.replace("_", " ").split())
+    return title[:1].upper() + title[1:]
+
+
+# Title index: the canonical title of every page seen, per language, and the
+# redirects and spellings that led to it. Lookups are mapped to the
+# canonical title before fetching (so "the earth" and "Earth" share a cache
+# entry), and a title that comes back missing is corrected from here before
+# falling back to auto_suggest's search request. WIKIPEDIA_TITLES bulk-loads
+# titles at startup, e.g. "simple:simplewiki-latest-all-titles-in-ns0.gz":
+# one title per line, or `title<TAB>target` for a redirect.
+TITLES = os.environ.get("WIKIPEDIA_TITLES", "")
+FUZZY_CUTOFF = 0.85
+FUZZY_CANDIDATES = 2000
+# Learned titles are folded into the sorted arrays (off the event loop)
+# once there are this many, or one for every LEARNED_SHARE bulk ones
+LEARNED_TITLES = 1000
+LEARNED_SHARE = 64
+# Titles per run when sorting a bulk load (see sorted_titles)
+SORT_RUN = 16384
+
+
+def sorted_titles(names: list[str]) -> list[str]:
+    """
+    `names` in casefolded order. One sort of millions of titles holds the
+    GIL, and so stalls the event loop, for seconds; short runs sorted one
+    at a time and then merged let it in between.
+    """
+    runs = [
+        sorted(names[start : start + SORT_RUN], key=str.casefold)
+        for start in range(0, len(names), SORT_RUN)
+    ]
+    return list(heapq.merge(*runs, key=str.casefold))
+
+
+class TitleIndex:
+    """
+    Canonical titles per language.
+
+    `exact` maps every known title (normalised) to its canonical title.
+    `keys` is a sorted array of casefolded titles with `names` alongside,
+    so case-insensitive, prefix and fuzzy matches are a bisection away.
+    These three are only ever replaced whole, never changed in place, so
+    load and merge can build new ones outside the lock and swap them in.
+    Titles learned from lookups go into the small `learned` map and the
+    `learned_keys` and `learned_names` arrays instead, since inserting into
+    the bulk-loaded ones (millions of titles) costs milliseconds; merge
+    folds them in once there are enough of them.
+    """
+
+    def __init__(self):
+        self.exact: dict[str, dict[str, str]] = {}
+        self.keys: dict[str, list[str]] = {}
+        self.names: dict[str, list[str]] = {}
+        self.learned: dict[str, dict[str, str]] = {}
+        self.learned_keys: dict[str, list[str]] = {}
+        self.learned_names: dict[str, list[str]] = {}
+        self.merging: set[str] = set()
+        self.lock = threading.Lock()
+        # Held through a whole load or merge, so one doesn't drop the other's
+        # titles; lookups only wait on `lock`, for the swap
+        self.sort_lock = threading.Lock()
+        self.stats = Counter()
+
+    def add(self, lang: str, title: str, canonical: str) -> bool:
+        """
+        Record that `title` leads to the page `canonical`. Returns whether
+        the learned titles are due to be merged (see merge).
+        """
+        title, canonical = normalize_title(title), normalize_title(canonical)
+        with self.lock:
+            exact = self.exact.get(lang, {})
+            learned = self.learned.setdefault(lang, {})
+            keys = self.learned_keys.setdefault(lang, [])
+            names = self.learned_names.setdefault(lang, [])
+            for name in (canonical, title):
+                known = learned.get(name) or exact.get(name)
+                if known == canonical:
+                    continue
+                learned[name] = canonical
+                if known is None:
+                    key = name.casefold()
+                    position = bisect.bisect_right(keys, key)
+                    keys.insert(position, key)
+                    names.insert(position, name)
+            limit = max(LEARNED_TITLES, len(self.keys.get(lang, ())) // LEARNED_SHARE)
+            if len(learned) < limit or lang in self.merging:
+                return False
+            self.merging.add(lang)
+            return True
+
+    def learn(self, lang: str, title: str, cached: dict, auto_suggest: bool) -> bool:
+        """Record where a lookup of `title` ended up, from its cache value."""
+        canonical = cached.get("disambiguation") or cached.get("page", {}).get("title")
+        if not canonical:
+            return False
+        # An auto-suggested page was a guess, not where `title` leads
+        return self.add(lang, canonical if auto_suggest else title, canonical)
+
+    def load(self, lang: str, path: str) -> int:
+        """
+        Add the titles in `path` (optionally .gz or .bz2): one per line,
+        or `title<TAB>target` for a redirect. Returns how many were read.
+        """
+        opener = {".bz2": bz2.open, ".gz": gzip.open}.get(
+            os.path.splitext(path)[1], open
+        )
+        loaded = {}
+        with opener(path, "rt", encoding="utf-8") as lines:
+            for line in lines:
+                title, _, target = line.rstrip("\n").partition("\t")
+                if title and title != "page_title":  # the all-titles header
+                    target = normalize_title(target or title)
+                    loaded[normalize_title(title)] = target
+                    loaded.setdefault(target, target)
+        with self.sort_lock:
+            learned, _ = self._learned(lang)
+            # Titles known before keep their targets unless the file says
+            # otherwise; added one by one, as a single dict merge or sort
+            # would hold the GIL throughout (see sorted_titles)
+            exact = loaded
+            for known in (learned, self.exact.get(lang, {})):
+                for name, canonical in known.items():
+                    exact.setdefault(name, canonical)
+            names = sorted_titles(list(exact))
+            keys = [name.casefold() for name in names]
+            self._swap(lang, exact, keys, names, learned)
+        return len(exact)
+
+    def merge(self, lang: str):
+        """Fold the titles learned in `lang` into the sorted arrays."""
+        with self.sort_lock:
+            learned, extra = self._learned(lang)
+            exact = {
+                name: canonical for name, canonical in self.exact.get(lang, {}).items()
+            }
+            exact.update(learned)
+            # Both are sorted already: copy the bulk arrays over in slices,
+            # with each learned title put in between
+            old_keys, old_names = self.keys.get(lang, []), self.names.get(lang, [])
+            keys, names, start = [], [], 0
+            for key, name in extra:
+                end = bisect.bisect_right(old_keys, key, start)
+                keys += old_keys[start:end]
+                names += old_names[start:end]
+                keys.append(key)
+                names.append(name)
+                start = end
+            keys += old_keys[start:]
+            names += old_names[start:]
+            self._swap(lang, exact, keys, names, learned)
+
+    def _learned(self, lang: str) -> tuple[dict[str, str], list[tuple[str, str]]]:
+        """A copy of the titles learned in `lang` so far, and their keys."""
+        with self.lock:
+            return dict(self.learned.get(lang, {})), list(
+                zip(self.learned_keys.get(lang, []), self.learned_names.get(lang, []))
+            )
+
+    def _swap(self, lang, exact, keys, names, merged: dict[str, str]):
+        """Put rebuilt arrays in place, keeping what was learned meanwhile."""
+        with self.lock:
+            later = {
+                name: canonical
+                for name, canonical in self.learned.get(lang, {}).items()
+                if merged.get(name) != canonical
+            }
+            pairs = sorted(
+                (name.casefold(), name) for name in later if name not in exact
+            )
+            self.exact[lang], self.keys[lang], self.names[lang] = exact, keys, names
+            self.learned[lang] = later
+            self.learned_keys[lang] = [key for key, _ in pairs]
+            self.learned_names[lang] = [name for _, name in pairs]
+            self.merging.discard(lang)
+
+    def canonical(self, lang: str, title: str) -> str:
+        """The canonical title `title` is known to lead to, else `title`."""
+        name = normalize_title(title)
+        known = self.learned.get(lang, {}).get(name) or self.exact.get(lang, {}).get(
+            name
+        )
+        return known or title
+
+    def suggest(self, lang: str, title: str) -> str | None:
+        """
+        Correct a title that was not found: by case, then as the start of a
+        longer title, then by similarity. None if nothing is close enough.
+        """
+        name = normalize_title(title)
+        key = name.casefold()
+        prefixed, similar = [], []
+        with self.lock:
+            exact, learned = self.exact.get(lang, {}), self.learned.get(lang, {})
+            # The bulk-loaded titles, then those learned since
+            for keys, names in (
+                (self.keys.get(lang, []), self.names.get(lang, [])),
+                (self.learned_keys.get(lang, []), self.learned_names.get(lang, [])),
+            ):
+                start = bisect.bisect_left(keys, key)
+                end = bisect.bisect_left(keys, key + "\uffff")
+                end = min(end, start + FUZZY_CANDIDATES)
+                prefixed += zip(keys[start:end], names[start:end])
+                if key:
+                    # Similar titles sharing the first letter, nearest in order
+                    low = bisect.bisect_left(keys, key[0])
+                    high = bisect.bisect_left(keys, key[0] + "\uffff")
+                    low = max(low, start - FUZZY_CANDIDATES // 2)
+                    high = min(high, low + FUZZY_CANDIDATES)
+                    similar += zip(keys[low:high], names[low:high])
+
+        match, how = None, None
+        matches = [other for _, other in sorted(prefixed) if other != name]
+        if matches and matches[0].casefold() == key:
+            match, how = matches[0], "case"
+        elif matches:
+            shortest = min(matches, key=len)
+            if len(name) >= 0.6 * len(shortest):
+                match, how = shortest, "prefix"
+        if match is None and similar:
+            close = difflib.get_close_matches(
+                key, [other for other, _ in similar], n=1, cutoff=FUZZY_CUTOFF
+            )
+            if close:
+                match = next(other for found, other in similar if found == close[0])
+                how = "fuzzy"
+        if match is not None:
+            match = learned.get(match) or exact.get(match, match)
+        if match is None or match == name:
+            self.stats["misses"] += 1
+            return None
+        self.stats[how] += 1
+        return match
+
+    def snapshot(self) -> dict[str, Any]:
+        """Titles known per language and how corrections were found."""
+        return {
+            "titles": {
+                lang: len(self.exact.get(lang, {}))
+                + len(self.learned_keys.get(lang, []))
+                for lang in {*self.exact, *self.learned_keys}
+            },
+            **{how: self.stats[how] for how in ("case", "prefix", "fuzzy", "misses")},
+        }
+
+
+title_index = TitleIndex()
+
+
+# Offline mode: set WIKIPEDIA_OFFLINE_INDEX to a directory built with
+# `mcp-se-wikipedia build-index` and every lookup is answered from it, with
+# one subdirectory per language (e.g. simple/, en/).
+OFFLINE_INDEX = os.environ.get("WIKIPEDIA_OFFLINE_INDEX", "")
+
+DISAMBIGUATION_TEMPLATE = re.compile(
+    r"\{\{\s*(disambiguation|disambig|dab|disamb|hndis|geodis)\s*[|}]", re.IGNORECASE
+)
+CIRRUS_DISAMBIGUATION = {
+    "Template:Disambiguation",
+    "Template:Disambig",
+    "Template:Dab",
+    "Template:Hndis",
+    "Template:Geodis",
+}
+
+
+def wikitext_to_text(wikitext: str) -> str:
+    """
+    Roughly what TextExtracts' explaintext gives for a page's wikitext:
+    templates, tables, references and markup dropped, link labels and
+    `== Section ==` headings kept.
+    """
+    text = re.sub(r"<!--.*?-->", "", wikitext, flags=re.DOTALL)
+    text = re.sub(r"<ref[^>/]*/>|<ref[^>]*>.*?</ref>", "", text, flags=re.DOTALL)
+    previous = None
+    while previous != text:  # innermost templates first
+        previous = text
+        text = re.sub(r"\{\{[^{}]*\}\}", "", text)
+    text = re.sub(r"\{\|.*?\|\}", "", text, flags=re.DOTALL)
+    previous = None
+    while previous != text:  # files and categories may contain links
+        previous = text
+        text = re.sub(
+            r"\[\[(?:File|Image|Category):[^\[\]]*\]\]", "", text, flags=re.IGNORECASE
+        )
+        text = re.sub(r"\[\[(?:[^|\[\]]*\|)?([^|\[\]]*)\]\]", r"\1", text)
+    text = re.sub(r"\[https?://\S+\s*([^\]]*)\]", r"\1", text)
+    text = re.sub(r"<[^>]+>|'{2,}|__[A-Z]+__", "", text)
+    text = re.sub(r"^(=+)\s*(.*?)\s*\1\s*$", r"\n\n\1 \2 \1", text, flags=re.MULTILINE)
+    text = re.sub(r"^[*#:;]+\s*", "", text, flags=re.MULTILINE)
+    text = re.sub(r"[ \t]+\n", "\n", html.unescape(text))
+    return re.sub(r"\n{4,}", "\n\n\n", text).strip()
+
+
+def disambiguation_links(wikitext: str) -> list[str]:
+    """The first link label of every list item, like a rendered page's <li>s."""
+    options = []
+    for line in wikitext.splitlines():
+        if line.startswith("*"):
+            link = re.search(r"\[\[([^|\]]*)(?:\|([^\]]*))?\]\]", line)
+            if link:
+                options.append((link.group(2) or link.group(1)).strip())
+    return options
+
+
+def _local_name(tag: str) -> str:
+    return tag.rsplit("}", 1)[-1]
+
+
+def _child(element: ElementTree.Element, name: str) -> ElementTree.Element | None:
+    for child in element:
+        if _local_name(child.tag) == name:
+            return child
+    return None
+
+
+def read_dump(path: str) -> Iterator[dict[str, Any]]:
+    """
+    Yield the articles (namespace 0) of a Wikipedia dump.
+
+    Reads pages-articles XML and CirrusSearch JSON-lines dumps, optionally
+    compressed with bz2 or gzip. Every item has a title and either a
+    `redirect` target or `text`, `length`, `revision`, `disambiguation`
+    and `options`.
+    """
+    opener = {".bz2": bz2.open, ".gz": gzip.open}.get(os.path.splitext(path)[1], open)
+    with opener(path, "rb") as dump:
+        first = dump.read(1)
+        while first.isspace():
+            first = dump.read(1)
+        dump.seek(0)
+
+        if first == b"<":
+            root = None
+            for event, element in ElementTree.iterparse(dump, ("start", "end")):
+                if root is None:
+                    root = element
+                if event != "end" or _local_name(element.tag) != "page":
+                    continue
+                namespace = _child(element, "ns")
+                if namespace is None or namespace.text == "0":
+                    title = _child(element, "title").text
+                    redirect = _child(element, "redirect")
+                    revision = _child(element, "revision")
+                    wikitext = _child(revision, "text").text or ""
+                    if redirect is not None:
+                        yield {"title": title, "redirect": redirect.get("title")}
+                    else:
+                        disambiguation = bool(DISAMBIGUATION_TEMPLATE.search(wikitext))
+                        yield {
+                            "title": title,
+                            "text": wikitext_to_text(wikitext),
+                            "length": len(wikitext.encode()),
+                            "revision": int(_child(revision, "id").text),
+                            "disambiguation": disambiguation,
+                            "options": (
+                                disambiguation_links(wikitext) if disambiguation else []
+                            ),
+                        }
+                # Drop the finished pages from the tree, or the emptied
+                # elements alone add up to gigabytes for the English dump
+                root.clear()
+            return
+
+        for line in dump:
+            doc = json.loads(line)
+            if "title" not in doc or doc.get("namespace", 0) != 0:
+                continue  # CirrusSearch puts an index line before each page
+            text = doc.get("text", "")
+            disambiguation = bool(CIRRUS_DISAMBIGUATION & set(doc.get("template", [])))
+            yield {
+                "title": doc["title"],
+                "text": text,
+                "length": doc.get("text_bytes", len(text.encode())),
+                "revision": doc.get("version", 0),
+                "disambiguation": disambiguation,
+                "options": [
+                    link.replace("_", " ") for link in doc.get("outgoing_link", [])
+                ]
+                if disambiguation
+                else [],
+            }
+            for redirect in doc.get("redirect", []):
+                if redirect.get("namespace", 0) == 0:
+                    yield {"title": redirect["title"], "redirect": doc["title"]}
+
+
+class OfflineClient:
+    """
+    Serves one language from a local index built from a Wikipedia dump,
+    with the same methods and exceptions as WikipediaClient.
+
+    Article text is zlib-compressed into one append-only file that is
+    memory-mapped for reads. SQLite holds the title -> offset index, the
+    redirects and an FTS5 full-text index for search.
+    """
+
+    def __init__(self, lang: str, directory: str, create: bool = False):
+        self.lang = lang
+        self.directory = directory
+        self.articles_path = os.path.join(directory, "articles.bin")
+        self.lock = threading.Lock()
+        self.articles = None
+        if create:
+            os.makedirs(directory, exist_ok=True)
+        # A language without an index behaves like a wiki with no pages
+        path = os.path.join(directory, "index.sqlite3")
+        self.db = sqlite3.connect(
+            path if os.path.isdir(directory) else ":memory:", check_same_thread=False
+        )
+        self.db.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS pages (
+                id INTEGER PRIMARY KEY, title TEXT UNIQUE, revision INTEGER,
+                length INTEGER, offset INTEGER, size INTEGER, disambiguation INTEGER
+            );
+            CREATE TABLE IF NOT EXISTS redirects (title TEXT PRIMARY KEY, target TEXT);
+            CREATE VIRTUAL TABLE IF NOT EXISTS search
+                USING fts5(title, body, content='');
+            """
+        )
+
+    # Reading
+
+    def _read(self, offset: int, size: int) -> dict:
+        """Decompress one article record from the memory-mapped file."""
+        with self.lock:
+            if self.articles is None or len(self.articles) < offset + size:
+                with open(self.articles_path, "rb") as articles:
+                    self.articles = mmap.mmap(
+                        articles.fileno(), 0, access=mmap.ACCESS_READ
+                    )
+            record = self.articles[offset : offset + size]
+        return json.loads(zlib.decompress(record))
+
+    def _row(self, title: str) -> tuple | None:
+        title = normalize_title(title)
+        with self.lock:
+            row = self.db.execute(
+                "SELECT title, length, offset, size, disambiguation, revision "
+                "FROM pages WHERE title = ?",
+                (title,),
+            ).fetchone()
+            if row is None:
+                target = self.db.execute(
+                    "SELECT target FROM redirects WHERE title = ?", (title,)
+                ).fetchone()
+                if target is not None:
+                    row = self.db.execute(
+                        "SELECT title, length, offset, size, disambiguation, revision "
+                        "FROM pages WHERE title = ?",
+                        target,
+                    ).fetchone()
+        return row
+
+    def url(self, title: str) -> str:
+        path = urllib.parse.quote(title.replace(" ", "_"), safe=":/,()'!*;@$")
+        return f"https://{self.lang}.wikipedia.org/wiki/{path}"
+
+    def search(self, query: str, limit: int = 10) -> list[str]:
+        """Titles of the best full-text matches, title hits weighted up."""
+        words = re.findall(r"\w+", query)
+        if not words:
+            return []
+        for operator in (" AND ", " OR "):
+            match = operator.join('"' + word + '"' for word in words)
+            with self.lock:
+                rows = self.db.execute(
+                    "SELECT pages.title FROM search JOIN pages ON pages.id = search.rowid "
+                    "WHERE search MATCH ? ORDER BY bm25(search, 10.0, 1.0) LIMIT ?",
+                    (match, limit),
+                ).fetchall()
+            if rows:
+                return [row[0] for row in rows]
+        return []
+
+    def search_snippets(self, query: str, limit: int = 10) -> list[dict[str, Any]]:
+        hits = []
+        for title in self.search(query, limit):
+            found, length, offset, size, *_ = self._row(title)
+            intro = self._intro(self._read(offset, size)["text"])
+            sentences = re.split(r"(?<=[.!?])\s+", " ".join(intro.split()))
+            hits.append(
+                {
+                    "title": found,
+                    "url": self.url(found),
+                    "length": length,
+                    "extract": " ".join(sentences[:2]),
+                }
+            )
+        return hits
+
+    @staticmethod
+    def _intro(text: str) -> str:
+        """The text before the first section heading."""
+        return text.split("\n\n\n==", 1)[0].strip()
+
+    def suggest(self, query: str) -> str:
+        if self._row(query) is not None:
+            return normalize_title(query)
+        results = self.search(query, 1)
+        if results:
+            return results[0]
+        raise PageError(query)
+
+    def page(
+        self,
+        title: str,
+        auto_suggest: bool = False,
+        summary: bool = False,
+        content: bool = False,
+    ) -> Page:
+        if auto_suggest:
+            title = self.suggest(title)
+        row = self._row(title)
+        if row is None:
+            raise PageError(title)
+
+        found, length, offset, size, disambiguation, revision = row
+        record = self._read(offset, size)
+        if disambiguation:
+            raise DisambiguationError(found, record["options"])
+
+        page = Page(title=found, url=self.url(found), length=length, revision=revision)
+        if content:
+            page.content = record["text"]
+        elif summary:
+            page.summary = self._intro(record["text"])
+        return page
+
+    def pages(
+        self, titles: list[str], summary: bool = False
+    ) -> dict[str, Page | WikipediaException]:
+        results = {}
+        for title in titles:
+            try:
+                results[title] = self.page(title, summary=summary)
+            except (PageError, DisambiguationError) as e:
+                results[title] = e
+        return results
+
+    # Building
+
+    def _unsearch(self, old: tuple, title: str):
+        """Remove a page's old text from the full-text index."""
+        old_text = self._read(old[2], old[3])["text"]
+        self.db.execute(
+            "INSERT INTO search(search, rowid, title, body) VALUES ('delete', ?, ?, ?)",
+            (old[0], title, old_text),
+        )
+
+    def build(self, dump_path: str) -> Counter:
+        """
+        Add the articles of a dump to the index.
+        Pages already indexed at the same revision are skipped, so a build
+        can be resumed or re-run against a newer dump.
+        """
+        counts = Counter()
+        with open(self.articles_path, "ab") as articles:
+            for number, item in enumerate(read_dump(dump_path), 1):
+                title = normalize_title(item["title"])
+                old = self.db.execute(
+                    "SELECT id, revision, offset, size FROM pages WHERE title = ?",
+                    (title,),
+                ).fetchone()
+                if "redirect" in item:
+                    if old is not None:
+                        # An article that became a redirect: lookups check
+                        # pages first, so the old article has to go
+                        articles.flush()
+                        self._unsearch(old, title)
+                        self.db.execute("DELETE FROM pages WHERE id = ?", (old[0],))
+                    self.db.execute(
+                        "INSERT OR REPLACE INTO redirects VALUES (?, ?)",
+                        (title, normalize_title(item["redirect"])),
+                    )
+                    counts["redirects"] += 1
+                    continue
+
+                if old is not None and old[1] == item["revision"]:
+                    counts["unchanged"] += 1
+                    continue
+
+                record = zlib.compress(
+                    json.dumps(
+                        {"text": item["text"], "options": item["options"]}
+                    ).encode()
+                )
+                offset = articles.tell()
+                articles.write(record)
+
+                if old is not None:
+                    articles.flush()
+                    self._unsearch(old, title)
+                    self.db.execute(
+                        "UPDATE pages SET revision = ?, length = ?, offset = ?, "
+                        "size = ?, disambiguation = ? WHERE id = ?",
+                        (
+                            item["revision"],
+                            item["length"],
+                            offset,
+                            len(record),
+                            item["disambiguation"],
+                            old[0],
+                        ),
+                    )
+                    page_id = old[0]
+                    counts["updated"] += 1
+                else:
+                    # A redirect that became an article
+                    self.db.execute("DELETE FROM redirects WHERE title = ?", (title,))
+                    page_id = self.db.execute(
+                        "INSERT INTO pages (title, revision, length, offset, size, "
+                        "disambiguation) VALUES (?, ?, ?, ?, ?, ?)",
+                        (
+                            title,
+                            item["revision"],
+                            item["length"],
+                            offset,
+                            len(record),
+                            item["disambiguation"],
+                        ),
+                    ).lastrowid
+                    counts["added"] += 1
+                self.db.execute(
+                    "INSERT INTO search(rowid, title, body) VALUES (?, ?, ?)",
+                    (page_id, title, item["text"]),
+                )
+
+                if number % 1000 == 0:
+                    articles.flush()
+                    self.db.commit()
+                    logger.info(f"Indexed {number} pages from {dump_path}")
+        self.db.commit()
+        return counts
+
+
+def languages(requested: list[str] | None = None) -> list[str]:
+    """
+    The languages to try, in order of preference: `requested` (a tool's
+    `languages` argument), else WIKIPEDIA_LANGUAGES, else WIKIPEDIA_MODE's.
+    """
+    if requested:
+        if not isinstance(requested, list) or not all(
+            isinstance(lang, str) for lang in requested
+        ):
+            raise ValueError("Languages must be a list of language codes")
+        langs = list(dict.fromkeys(lang.strip().lower() for lang in requested))
+        invalid = [lang for lang in langs if lang not in ALLOWED_LANGUAGES]
+        if invalid:
+            raise ValueError(
+                f"Languages not enabled on this server: {', '.join(invalid)} "
+                f"(enabled: {', '.join(sorted(ALLOWED_LANGUAGES))})"
+            )
+        if len(langs) > MAX_LANGUAGES:
+            raise ValueError(f"At most {MAX_LANGUAGES} languages can be tried")
+    else:
+        langs = LANGUAGES or (["simple", "en"] if USE_SIMPLE_FIRST else ["en"])
+    if OFFLINE_INDEX:
+        # Offline, only languages with an index take part
+        indexed = [
+            lang for lang in langs if os.path.isdir(os.path.join(OFFLINE_INDEX, lang))
+        ]
+        return indexed or langs
+    return langs
+
+
+clients: dict[str, Backend] = {}
+clients_lock = threading.Lock()
+
+
+def get_client(lang: str) -> Backend:
+    """
+    Return the shared client for `lang`, creating it on first use.
+    Safe to call from the worker pool, which the warm-up does.
+    """
+    if lang not in clients:
+        with clients_lock:
+            if lang not in clients:
+                if OFFLINE_INDEX:
+                    clients[lang] = OfflineClient(
+                        lang, os.path.join(OFFLINE_INDEX, lang)
+                    )
+                else:
+                    clients[lang] = WikipediaClient(lang)
+    return clients[lang]
+
+
+async def run_blocking(func: Callable, *args, **kwargs) -> Any:
+    """Run a blocking call on the worker pool."""
+    call = functools.partial(func, *args, **kwargs)
+    return await asyncio.get_running_loop().run_in_executor(executor, call)
+
+
+async def run_cache_io(func: Callable, *args) -> Any:
+    """Run a blocking cache call on the cache pool."""
+    call = functools.partial(func, *args)
+    return await asyncio.get_running_loop().run_in_executor(cache_executor, call)
+
+
+async def call_backend(lang: str, call: str, func: Callable, *args) -> Any:
+    """
+    Run one backend call on the worker pool, counting and timing it per
+    language. Missing and disambiguation pages are answers, not errors.
+    """
+    started = time.perf_counter()
+    status = "error"
+    try:
+        result = await run_blocking(func, *args)
+        status = "ok"
+        return result
+    except (PageError, DisambiguationError):
+        status = "ok"
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        metrics.inc(
+            "wikipedia_upstream_calls_total", lang=lang, call=call, status=status
+        )
+        metrics.observe(
+            "wikipedia_upstream_duration_seconds", elapsed, lang=lang, call=call
+        )
+
+
+# Cache reads that miss memory go to SQLite, and writes compress page texts
+# and commit to SQLite, so both run on the cache pool instead of stalling
+# every other call on the event loop; memory hits are answered inline.
+
+
+async def cache_get(key: tuple[str, str, str]) -> dict | None:
+    """cache.get, reading SQLite on the cache pool after a memory miss."""
+    value = cache.get_memory(key)
+    if value is None:
+        if cache.db is None:
+            return cache.get_disk(key)  # just counts the miss
+        value = await run_cache_io(cache.get_disk, key)
+    return value
+
+
+async def cache_set(key: tuple[str, str, str], value: dict):
+    """cache.set on the cache pool."""
+    if cache.size or cache.db is not None:
+        await run_cache_io(cache.set, key, value)
+
+
+async def serve_stale(key: tuple, lang: str, error: Exception) -> dict:
+    """
+    Answer a failed upstream call from the expired cache entry for `key`,
+    or re-raise `error` when there is none.
+    """
+    stale = await run_cache_io(cache.get_stale, key)
+    if stale is None:
+        raise error
+    logger.warning(f"Serving stale {key} after upstream error: {error}")
+    metrics.inc("wikipedia_stale_served_total", lang=lang)
+    return stale
+
+
+async def fetch_search(
+    lang: str, query: str, limit: int, snippets: bool = False
+) -> list[str] | list[dict[str, Any]]:
+    """Search `lang`, going through the cache."""
+    tool = "snippets" if snippets else "search"
+    key = (lang, " ".join(query.casefold().split()), f"{tool}:{limit}")
+    started = time.perf_counter()
+    cached = await cache_get(key)
+    source = "cache"
+    if cached is None:
+        source = "upstream" if key not in inflight.flights else "coalesced"
+
+        async def load() -> dict:
+            client = get_client(lang)
+            search = client.search_snippets if snippets else client.search
+            try:
+                found = await call_backend(lang, tool, search, query, limit)
+            except Exception as e:
+                return await serve_stale(key, lang, e)
+            results = {"results": found}
+            await cache_set(key, results)
+            return results
+
+        cached = await inflight.do(key, load)
+    add_span(
+        {
+            "stage": f"{lang} {tool}",
+            "query": query,
+            "source": source,
+            "results": len(cached["results"]),
+            "ms": round((time.perf_counter() - started) * 1000, 1),
+        }
+    )
+    return cached["results"]
+
+
+def page_key(lang: str, title: str, tool: str, auto_suggest: bool) -> tuple:
+    """Cache key for a page lookup."""
+    if auto_suggest:
+        tool += ":auto_suggest"
+    return (lang, normalize_title(title), tool)
+
+
+def to_cached(result: Page | Exception) -> dict:
+    """Turn a page or a missing/disambiguation error into a cache value."""
+    if isinstance(result, DisambiguationError):
+        return {"disambiguation": result.title, "options": result.options}
+    if isinstance(result, PageError):
+        return {"missing": result.title}
+    return {"page": asdict(result)}
+
+
+def from_cached(cached: dict) -> Page:
+    """Return the cached page, or re-raise the cached error."""
+    if "missing" in cached:
+        raise PageError(cached["missing"])
+    if "disambiguation" in cached:
+        raise DisambiguationError(cached["disambiguation"], cached["options"])
+    page = dict(cached["page"])
+    body = page.pop("body", None)
+    if body is not None:
+        # Stored pages keep their text in the body store; it is decompressed
+        # here, when the page is actually served
+        page[page.pop("field")] = cache.read_body(body, page.pop("bytes"))
+    return Page(**page)
+
+
+async def fetch_page(
+    lang: str,
+    title: str,
+    auto_suggest: bool = False,
+    summary: bool = False,
+    content: bool = False,
+    prefetched: dict[str, dict] | None = None,
+) -> Page:
+    """
+    Load a page from `lang`, going through the cache.
+    Missing pages and disambiguation pages are cached too and re-raised
+    as PageError and DisambiguationError. Identical lookups that arrive
+    while one is in flight share its upstream request. `prefetched` holds
+    the cache values a batch already loaded (see prefetch_pages), used
+    when the cache doesn't have them (e.g. it is disabled).
+    """
+    key = page_key(lang, title, "summary" if summary else "content", auto_suggest)
+    started = time.perf_counter()
+    if recording_access.get() and cache.record_access(key):
+        await run_cache_io(cache.flush_access)
+    cached = await cache_get(key)
+    source = "cache"
+    if cached is None and prefetched and not auto_suggest:
+        cached = prefetched.get(key[1])
+        source = "prefetch"
+
+    async def load() -> dict:
+        try:
+            page = await call_backend(
+                lang,
+                "page",
+                get_client(lang).page,
+                title,
+                auto_suggest,
+                summary,
+                content,
+            )
+            loaded = to_cached(page)
+        except (PageError, DisambiguationError) as e:
+            loaded = to_cached(e)
+        except Exception as e:
+            return await serve_stale(key, lang, e)
+        await cache_set(key, loaded)
+        return loaded
+
+    if cached is None:
+        source = "upstream" if key not in inflight.flights else "coalesced"
+        cached = await inflight.do(key, load)
+    elif cache.ageing(key) and key not in inflight.flights:
+        # Stale-while-revalidate: answer now, refresh for the next caller
+        metrics.inc("wikipedia_cache_refreshes_total", lang=lang)
+        refresh_in_background(key, load)
+    add_span(
+        {
+            "stage": f"{lang} auto_suggest" if auto_suggest else lang,
+            "title": title,
+            "source": source,
+            "result": next(iter(cached)),
+            "ms": round((time.perf_counter() - started) * 1000, 1),
+        }
+    )
+    if title_index.learn(lang, title, cached, auto_suggest):
+        executor.submit(title_index.merge, lang)
+    body = cached.get("page", {}).get("body")
+    if body is not None and body not in cache.bodies:
+        # Only in SQLite (a memory-resident body is decompressed right here)
+        return await run_cache_io(from_cached, cached)
+    return from_cached(cached)
+
+
+refreshes: set[asyncio.Task] = set()
+
+
+def refresh_in_background(key: tuple, load: Callable[[], Awaitable[dict]]):
+    """Reload `key` without anyone waiting on it."""
+    task = asyncio.create_task(inflight.do(key, load))
+    refreshes.add(task)
+
+    def done(task: asyncio.Task):
+        refreshes.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning(f"Background refresh of {key} failed: {task.exception()}")
+
+    task.add_done_callback(done)
+
+
+async def prefetch_pages(lang: str, titles: list[str], tool: str) -> dict[str, dict]:
+    """
+    Resolve `titles` in `lang` with multi-title queries and seed the cache.
+    Returns the cache values by normalised title, for the per-title
+    lookups that follow to use whether or not the cache kept them.
+
+    Full text can only be fetched one page per request, so for `content`
+    this only settles which titles are missing or disambiguation pages.
+    """
+
+    def uncached() -> list[str]:
+        return [
+            title
+            for title in titles
+            if cache.get(page_key(lang, title, tool, False)) is None
+        ]
+
+    todo = await run_cache_io(uncached)
+    if not todo:
+        return {}
+    started = time.perf_counter()
+    results = await call_backend(
+        lang, "pages", get_client(lang).pages, todo, tool == "summary"
+    )
+    add_span(
+        {
+            "stage": f"{lang} prefetch",
+            "titles": len(todo),
+            "source": "upstream",
+            "ms": round((time.perf_counter() - started) * 1000, 1),
+        }
+    )
+
+    loaded = {
+        normalize_title(title): to_cached(result)
+        for title, result in results.items()
+        if tool == "summary" or isinstance(result, Exception)
+    }
+
+    def store():
+        for title, value in loaded.items():
+            cache.set(page_key(lang, title, tool, False), value)
+
+    await run_cache_io(store)
+    return loaded
+
+
+# Titles per summary_batch/content_batch call
+MAX_BATCH_TITLES = 50
+
+# The per-request fallback chain every page and search tool takes
+LANGUAGES_PROPERTY = {
+    "type": "array",
+    "items": {"type": "string"},
+    "description": "Wikipedia language codes to try in order, e.g. ['simple', 'en', 'de']; a page too short to be useful falls through to the next (default: the server's configured chain)",
+    "minItems": 1,
+    "maxItems": MAX_LANGUAGES,
+}
+
 
 @server.list_tools()
 async def handle_list_tools() -> list[Tool]:
@@ -54,6 +2205,12 @@ async def handle_list_tools() -> list[Tool]:
                         "minimum": 1,
                         "maximum": 20,
                     },
+                    "snippets": {
+                        "type": "boolean",
+                        "description": "Also return each result's URL, page size and the start of its summary, in the same request (default: false)",
+                        "default": False,
+                    },
+                    "languages": LANGUAGES_PROPERTY,
                 },
                 "required": ["query"],
             },
@@ -73,6 +2230,23 @@ async def handle_list_tools() -> list[Tool]:
                         "description": "Whether to automatically suggest similar titles if exact match not found (default: false)",
                         "default": False,
                     },
+                    "detail": {
+                        "type": "string",
+                        "enum": ["sentence", "intro"],
+                        "description": "'sentence' for just the first sentence, 'intro' for the whole introduction (default: intro)",
+                        "default": "intro",
+                    },
+                    "max_chars": {
+                        "type": "integer",
+                        "description": "Return at most this many characters, ending on a whole sentence where possible (default: no limit)",
+                        "minimum": 1,
+                    },
+                    "max_tokens": {
+                        "type": "integer",
+                        "description": "Like max_chars, in tokens (estimated at 4 characters each); the smaller of the two applies",
+                        "minimum": 1,
+                    },
+                    "languages": LANGUAGES_PROPERTY,
                 },
                 "required": ["title"],
             },
@@ -92,13 +2266,205 @@ async def handle_list_tools() -> list[Tool]:
                         "description": "Whether to automatically suggest similar titles if exact match not found (default: false)",
                         "default": False,
                     },
+                    "detail": {
+                        "type": "string",
+                        "enum": list(DETAILS),
+                        "description": "How much of the article: its first sentence, the introduction, the introduction and the outline of its sections, or everything (default: full)",
+                        "default": "full",
+                    },
+                    "section": {
+                        "type": "string",
+                        "description": "Only return this section (with its subsections), e.g. 'History'. Use an empty string for the introduction",
+                    },
+                    "offset": {
+                        "type": "integer",
+                        "description": "Character to start from, e.g. the Next Offset of the previous call (default: 0)",
+                        "default": 0,
+                        "minimum": 0,
+                    },
+                    "max_chars": {
+                        "type": "integer",
+                        "description": "Return at most this many characters, ending on a whole sentence where possible; the metadata then gives the offset to continue from (default: no limit)",
+                        "minimum": 1,
+                    },
+                    "max_tokens": {
+                        "type": "integer",
+                        "description": "Like max_chars, in tokens (estimated at 4 characters each); the smaller of the two applies",
+                        "minimum": 1,
+                    },
+                    "languages": LANGUAGES_PROPERTY,
+                },
+                "required": ["title"],
+            },
+        ),
+        Tool(
+            name="sections",
+            description="List the sections of a Wikipedia page with their sizes, to fetch only the ones needed with the section tool. Tries Simple English first, falls back to English.",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "title": {
+                        "type": "string",
+                        "description": "Title of the Wikipedia page to list the sections of",
+                    },
+                    "auto_suggest": {
+                        "type": "boolean",
+                        "description": "Whether to automatically suggest similar titles if exact match not found (default: false)",
+                        "default": False,
+                    },
+                    "languages": LANGUAGES_PROPERTY,
+                },
+                "required": ["title"],
+            },
+        ),
+        Tool(
+            name="section",
+            description="Get one section of a Wikipedia page (with its subsections), by heading or by its index from the sections tool. Tries Simple English first, falls back to English.",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "title": {
+                        "type": "string",
+                        "description": "Title of the Wikipedia page",
+                    },
+                    "section": {
+                        "type": "string",
+                        "description": "Heading of the section, e.g. 'History'. Use an empty string for the introduction",
+                    },
+                    "index": {
+                        "type": "integer",
+                        "description": "Index of the section in the sections tool's outline (0 is the introduction), instead of its heading",
+                        "minimum": 0,
+                    },
+                    "auto_suggest": {
+                        "type": "boolean",
+                        "description": "Whether to automatically suggest similar titles if exact match not found (default: false)",
+                        "default": False,
+                    },
+                    "offset": {
+                        "type": "integer",
+                        "description": "Character to start from, e.g. the Next Offset of the previous call (default: 0)",
+                        "default": 0,
+                        "minimum": 0,
+                    },
+                    "max_chars": {
+                        "type": "integer",
+                        "description": "Return at most this many characters, ending on a whole sentence where possible; the metadata then gives the offset to continue from (default: no limit)",
+                        "minimum": 1,
+                    },
+                    "max_tokens": {
+                        "type": "integer",
+                        "description": "Like max_chars, in tokens (estimated at 4 characters each); the smaller of the two applies",
+                        "minimum": 1,
+                    },
+                    "languages": LANGUAGES_PROPERTY,
                 },
                 "required": ["title"],
             },
         ),
+        Tool(
+            name="summary_batch",
+            description="Get the summaries of several Wikipedia pages at once, e.g. every search result. Tries Simple English first, falls back to English.",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "titles": {
+                        "type": "array",
+                        "items": {"type": "string"},
+                        "description": "Titles of the Wikipedia pages to get summaries for",
+                        "minItems": 1,
+                        "maxItems": MAX_BATCH_TITLES,
+                    },
+                    "auto_suggest": {
+                        "type": "boolean",
+                        "description": "Whether to automatically suggest similar titles if exact match not found (default: false)",
+                        "default": False,
+                    },
+                    "languages": LANGUAGES_PROPERTY,
+                },
+                "required": ["titles"],
+            },
+        ),
+        Tool(
+            name="content_batch",
+            description="Get the full content of several Wikipedia pages at once. Tries Simple English first, falls back to English.",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "titles": {
+                        "type": "array",
+                        "items": {"type": "string"},
+                        "description": "Titles of the Wikipedia pages to retrieve full content for",
+                        "minItems": 1,
+                        "maxItems": MAX_BATCH_TITLES,
+                    },
+                    "auto_suggest": {
+                        "type": "boolean",
+                        "description": "Whether to automatically suggest similar titles if exact match not found (default: false)",
+                        "default": False,
+                    },
+                    "languages": LANGUAGES_PROPERTY,
+                },
+                "required": ["titles"],
+            },
+        ),
+    ]
+
+
+@server.list_resources()
+async def handle_list_resources() -> list[types.Resource]:
+    """List read-only resources describing the server itself."""
+    return [
+        types.Resource(
+            uri="wikipedia://stats/cache",
+            name="Cache statistics",
+            description="Hit, miss and eviction counters for the response cache, and how many lookups shared an in-flight request",
+            mimeType="application/json",
+        ),
+        types.Resource(
+            uri="wikipedia://stats/metrics",
+            name="Metrics",
+            description="Tool, lookup and upstream call counts and latency histograms, in the Prometheus text format",
+            mimeType="text/plain",
+        ),
     ]
 
 
+@server.read_resource()
+async def handle_read_resource(uri: AnyUrl) -> list[ReadResourceContents]:
+    """Return the current value of a server resource."""
+    if str(uri) == "wikipedia://stats/cache":
+        return [
+            ReadResourceContents(
+                content=json.dumps(
+                    {
+                        **cache.snapshot(),
+                        "single_flight": inflight.snapshot(),
+                        "title_index": title_index.snapshot(),
+                    },
+                    indent=2,
+                ),
+                mime_type="application/json",
+            )
+        ]
+    if str(uri) == "wikipedia://stats/metrics":
+        return [ReadResourceContents(content=metrics_text(), mime_type="text/plain")]
+    raise ValueError(f"Unknown resource: {uri}")
+
+
+# The tools call_tool dispatches; any other name a client sends is labelled
+# "unknown" in the metrics, so made-up names can't add series
+TOOL_NAMES = {
+    "search",
+    "summary",
+    "content",
+    "sections",
+    "section",
+    "summary_batch",
+    "content_batch",
+}
+
+
 @server.call_tool()
 async def handle_call_tool(
     name: str, arguments: dict[str, Any]
@@ -107,126 +2473,577 @@ async def handle_call_tool(
     Handle tool execution requests.
     Tools can modify server state and notify clients of changes.
     """
+    spans = [] if TRACE or CALL_LOG else None
+    token = trace_spans.set(spans)
+    called = time.time()
+    started = time.perf_counter()
+    status = "error"
+    tool = name if name in TOOL_NAMES else "unknown"
+    try:
+        result = await call_tool(name, arguments)
+        status = "ok"
+        size = sum(len(block.text.encode()) for block in result)
+        metrics.inc("wikipedia_tool_response_bytes_total", size, tool=tool)
+        return result
+    finally:
+        elapsed = time.perf_counter() - started
+        trace_spans.reset(token)
+        metrics.inc("wikipedia_tool_calls_total", tool=tool, status=status)
+        metrics.observe("wikipedia_tool_duration_seconds", elapsed, tool=tool)
+        if CALL_LOG:
+            try:
+                log_call(call_entry(name, arguments, status, called, elapsed, spans))
+            except OSError as e:
+                logger.warning(f"Could not write the call log: {e}")
+        if TRACE:
+            trace = {
+                "tool": name,
+                "arguments": arguments,
+                "status": status,
+                "ms": round(elapsed * 1000, 1),
+                "spans": spans,
+            }
+            logger.info(f"trace {json.dumps(trace)}")
 
+
+async def call_tool(name: str, arguments: dict[str, Any]) -> list[types.TextContent]:
+    """Dispatch a tool call to its handler."""
     if name == "search":
         return await handle_search(arguments)
     elif name == "summary":
         return await handle_summary(arguments)
     elif name == "content":
         return await handle_content(arguments)
+    elif name == "sections":
+        return await handle_sections(arguments)
+    elif name == "section":
+        return await handle_section(arguments)
+    elif name == "summary_batch":
+        return await handle_batch(arguments, "summary")
+    elif name == "content_batch":
+        return await handle_batch(arguments, "content")
     else:
         raise ValueError(f"Unknown tool: {name}")
 
 
+def language_list(langs: list[str]) -> str:
+    """'Simple English or English', for messages about a whole chain."""
+    names = [language_name(lang) for lang in langs]
+    return ", ".join(names[:-1]) + " or " + names[-1] if len(names) > 1 else names[0]
+
+
+def search_results(
+    query: str, lang: str, found: list[str] | list[dict[str, Any]], first: str
+) -> list[types.TextContent]:
+    """Format search hits as metadata and result blocks."""
+    note = ""
+    if lang != first:
+        note = f"\n**Note:** {language_name(first)} results not available"
+    if found and isinstance(found[0], dict):
+        lines = [
+            f"- **{hit['title']}** ({hit['length']} bytes) {hit['url']}\n  {hit['extract']}"
+            for hit in found
+        ]
+    else:
+        lines = [f"- {result}" for result in found]
+    return [
+        # Metadata
+        types.TextContent(
+            type="text",
+            text=f"# Search Metadata\n\n**Wikipedia Version:** {language_name(lang)}\n**Query:** {query}\n**Results Count:** {len(found)}\n**Language Code:** {lang}{note}",
+        ),
+        # Search Results
+        types.TextContent(type="text", text="# Search Results\n\n" + "\n".join(lines)),
+    ]
+
+
 async def handle_search(arguments: dict[str, Any]) -> list[types.TextContent]:
     """Handle Wikipedia search requests."""
     query = arguments.get("query")
     limit = arguments.get("limit", 10)
+    snippets = arguments.get("snippets", False)
 
     if not query:
         raise ValueError("Query parameter is required")
 
-    results = []
-
-    # Try Simple English Wikipedia first (unless WIKIPEDIA_MODE=full)
-    if USE_SIMPLE_FIRST:
-        try:
-            wikipedia.set_lang("simple")
-            search_results = wikipedia.search(query, results=limit)
-
-            if search_results:
-                # Metadata
-                results.append(
-                    types.TextContent(
-                        type="text",
-                        text=f"# Search Metadata\n\n**Wikipedia Version:** Simple English\n**Query:** {query}\n**Results Count:** {len(search_results)}\n**Language Code:** simple",
-                    )
-                )
-                # Search Results
-                results.append(
-                    types.TextContent(
-                        type="text",
-                        text="# Search Results\n\n"
-                        + "\n".join([f"- {result}" for result in search_results]),
-                    )
-                )
+    # Try Simple English Wikipedia first (unless configured otherwise)
+    langs = languages(arguments.get("languages"))
+    if HEDGED and len(langs) > 1:
+        pending = [
+            asyncio.create_task(fetch_search(lang, query, limit, snippets))
+            for lang in langs
+        ]
+    else:
+        pending = [fetch_search(lang, query, limit, snippets) for lang in langs]
+    try:
+        for lang, attempt in zip(langs, pending):
+            found = await attempt
+            if found:
+                add_span({"stage": "served", "lang": lang})
+                return search_results(query, lang, found, langs[0])
+    except Exception as e:
+        logger.error(f"Search error: {e}")
+        return [
+            types.TextContent(
+                type="text",
+                text=f"# Search Error\n\n**Wikipedia Version:** Error\n**Query:** {query}\n**Language Code:** N/A\n**Error:** {str(e)}",
+            )
+        ]
+    finally:
+        # Hedged probes (and unstarted ones) the answer did not need
+        for attempt in pending:
+            if isinstance(attempt, asyncio.Task):
+                attempt.cancel()
             else:
-                # Fallback to English Wikipedia
-                wikipedia.set_lang("en")
-                search_results = wikipedia.search(query, results=limit)
-
-                if search_results:
-                    # Metadata
-                    results.append(
-                        types.TextContent(
-                            type="text",
-                            text=f"# Search Metadata\n\n**Wikipedia Version:** English\n**Query:** {query}\n**Results Count:** {len(search_results)}\n**Language Code:** en\n**Note:** Simple English results not available",
-                        )
-                    )
-                    # Search Results
-                    results.append(
-                        types.TextContent(
-                            type="text",
-                            text="# Search Results\n\n"
-                            + "\n".join([f"- {result}" for result in search_results]),
-                        )
-                    )
-                else:
-                    results.append(
-                        types.TextContent(
-                            type="text",
-                            text=f"# Search Metadata\n\n**Wikipedia Version:** None (not found)\n**Query:** {query}\n**Results Count:** 0\n**Language Code:** N/A\n**Error:** No results found in Simple English or English Wikipedia",
-                        )
-                    )
+                attempt.close()
 
-        except Exception as e:
-            logger.error(f"Search error: {e}")
-            results.append(
-                types.TextContent(
-                    type="text",
-                    text=f"# Search Error\n\n**Wikipedia Version:** Error\n**Query:** {query}\n**Language Code:** N/A\n**Error:** {str(e)}",
-                )
+    return [
+        types.TextContent(
+            type="text",
+            text=f"# Search Metadata\n\n**Wikipedia Version:** None (not found)\n**Query:** {query}\n**Results Count:** 0\n**Language Code:** N/A\n**Error:** No results found in {language_list(langs)} Wikipedia",
+        )
+    ]
+
+
+@dataclass
+class Lookup:
+    """What one language had for a requested title."""
+
+    lang: str
+    page: Page | None = None
+    disambiguation: DisambiguationError | None = None
+    auto_suggested: bool = False
+    error: Exception | None = None
+    # The languages that were tried, in order
+    chain: tuple[str, ...] = ()
+
+    def is_stub(self, tool: str) -> bool:
+        if tool == "summary":
+            return self.page.length <= STUB_PAGE_BYTES
+        return len(self.page.content) <= STUB_CONTENT_CHARS
+
+
+async def lookup(
+    lang: str,
+    title: str,
+    auto_suggest: bool,
+    tool: str,
+    prefetched: dict[str, dict] | None = None,
+) -> Lookup:
+    """
+    Look `title` up in one language, timing it per language.
+    A missing page is retried with auto_suggest before giving up, like the
+    handlers always did. A missing page comes back as an empty Lookup.
+    """
+    started = time.perf_counter()
+    result = await lookup_once(lang, title, auto_suggest, tool, prefetched)
+    if result.error is not None:
+        outcome = "error"
+    elif result.disambiguation is not None:
+        outcome = "disambiguation"
+    elif result.page is None:
+        outcome = "missing"
+    else:
+        outcome = "auto_suggested" if result.auto_suggested else "found"
+    metrics.inc("wikipedia_lookups_total", lang=lang, tool=tool, result=outcome)
+    metrics.observe(
+        "wikipedia_lookup_duration_seconds",
+        time.perf_counter() - started,
+        lang=lang,
+        tool=tool,
+    )
+    return result
+
+
+async def lookup_once(
+    lang: str,
+    title: str,
+    auto_suggest: bool,
+    tool: str,
+    prefetched: dict[str, dict] | None = None,
+) -> Lookup:
+    fetch = functools.partial(
+        fetch_page,
+        lang,
+        summary=tool == "summary",
+        content=tool == "content",
+        prefetched=prefetched,
+    )
+    retry = None
+    if HEDGED and not auto_suggest:
+        # Start the auto_suggest retry alongside the exact lookup
+        retry = asyncio.create_task(fetch(title, True))
+    try:
+        return Lookup(
+            lang, page=await fetch(title_index.canonical(lang, title), auto_suggest)
+        )
+    except DisambiguationError as e:
+        return Lookup(lang, disambiguation=e)
+    except PageError:
+        # If auto_suggest is False, try a title from the index, then
+        # auto_suggest, before giving up
+        if not auto_suggest:
+            corrected = title_index.suggest(lang, title)
+            if corrected is not None:
+                try:
+                    page = await fetch(corrected, False)
+                    metrics.inc("wikipedia_title_corrections_total", lang=lang)
+                    return Lookup(lang, page=page, auto_suggested=True)
+                except DisambiguationError as e:
+                    return Lookup(lang, disambiguation=e)
+                except Exception:
+                    pass
+            metrics.inc("wikipedia_auto_suggest_retries_total", lang=lang, tool=tool)
+            try:
+                page = await (retry or fetch(title, True))
+                return Lookup(lang, page=page, auto_suggested=True)
+            except Exception:
+                pass
+        return Lookup(lang)
+    except Exception as e:
+        return Lookup(lang, error=e)
+    finally:
+        if retry is not None:
+            retry.cancel()
+            # An unused retry may have failed; mark it seen so asyncio stays quiet
+            retry.add_done_callback(lambda task: task.cancelled() or task.exception())
+
+
+def is_acceptable(result: Lookup, tool: str) -> bool:
+    """Whether a lookup is good enough to skip the languages after it."""
+    if result.error is not None:
+        logger.warning(f"{language_name(result.lang)} lookup failed: {result.error}")
+        reason = "error"
+    elif result.page is not None:
+        if not result.is_stub(tool):
+            return True
+        reason = "stub"
+    elif result.disambiguation is not None:
+        # A disambiguation page is an answer; a missing page is not
+        return True
+    else:
+        reason = "missing"
+    metrics.inc("wikipedia_fallbacks_total", tool=tool, reason=reason)
+    return False
+
+
+async def resolve(
+    title: str,
+    auto_suggest: bool,
+    tool: str,
+    langs: list[str] | None = None,
+    prefetched: dict[str, dict[str, dict]] | None = None,
+) -> Lookup:
+    """
+    Find `title` in each of `langs` (default: `languages()`) in turn, e.g.
+    Simple English first, then English. `prefetched` has what a batch
+    already loaded in each language (see prefetch_pages).
+
+    With WIKIPEDIA_HEDGED set, every language (and the auto_suggest retries)
+    is requested at the same time; the first good enough answer in chain
+    order still wins, and the requests after it are cancelled as soon as
+    that is known.
+    """
+    langs = langs or languages()
+    prefetched = prefetched or {}
+    if HEDGED and len(langs) > 1:
+        pending = [
+            asyncio.create_task(
+                lookup(lang, title, auto_suggest, tool, prefetched.get(lang))
             )
+            for lang in langs
+        ]
     else:
-        # Direct English Wikipedia mode
-        try:
-            wikipedia.set_lang("en")
-            search_results = wikipedia.search(query, results=limit)
-
-            if search_results:
-                # Metadata
-                results.append(
-                    types.TextContent(
-                        type="text",
-                        text=f"# Search Metadata\n\n**Wikipedia Version:** English\n**Query:** {query}\n**Results Count:** {len(search_results)}\n**Language Code:** en\n**Note:** Simple English results not available",
-                    )
-                )
-                # Search Results
-                results.append(
-                    types.TextContent(
-                        type="text",
-                        text="# Search Results\n\n"
-                        + "\n".join([f"- {result}" for result in search_results]),
-                    )
-                )
+        pending = [
+            lookup(lang, title, auto_suggest, tool, prefetched.get(lang))
+            for lang in langs
+        ]
+
+    try:
+        for position, attempt in enumerate(pending):
+            result = await attempt
+            if position == len(langs) - 1 or is_acceptable(result, tool):
+                result.chain = tuple(langs)
+                if result.page is not None or result.disambiguation is not None:
+                    add_span({"stage": "served", "lang": result.lang})
+                return result
+    finally:
+        for attempt in pending:
+            if isinstance(attempt, asyncio.Task):
+                attempt.cancel()
             else:
-                results.append(
-                    types.TextContent(
-                        type="text",
-                        text=f"# Search Metadata\n\n**Wikipedia Version:** None (not found)\n**Query:** {query}\n**Results Count:** 0\n**Language Code:** N/A\n**Error:** No results found in Simple English or English Wikipedia",
-                    )
-                )
+                attempt.close()
 
-        except Exception as e:
-            logger.error(f"Search error: {e}")
-            results.append(
-                types.TextContent(
-                    type="text",
-                    text=f"# Search Error\n\n**Wikipedia Version:** Error\n**Query:** {query}\n**Language Code:** N/A\n**Error:** {str(e)}",
-                )
+
+SECTION_HEADING = re.compile(r"^(={2,6})\s*(.+?)\s*\1[ \t]*$", re.MULTILINE)
+# The end of a sentence: a full stop, question or exclamation mark (and any
+# closing quotes or brackets) before whitespace, but not after an initial or
+# a common abbreviation
+SENTENCE_END = re.compile(
+    r"(?<!\b[A-Za-z])(?<!\bMr)(?<!\bMrs)(?<!\bDr)(?<!\bSt)(?<!\bMt)(?<!\bJr)"
+    r"(?<!\bSr)(?<!\bvs)(?<!\bNo)(?<!\bca)[.!?][\"')\]]*(?=\s)"
+)
+# Parsed articles kept, by URL, revision and text
+PARSED_SIZE = 64
+# max_tokens is turned into characters at this rate, a rough average for
+# English text with common tokenizers
+CHARS_PER_TOKEN = 4
+# The detail levels of the content tool, smallest first; summary has the
+# first two
+DETAILS = ("sentence", "intro", "outline", "full")
+
+
+def split_sections(content: str) -> tuple[tuple[int, str, int, int], ...]:
+    """
+    Split plain-text page content at its `== Heading ==` lines.
+    Returns (level, heading, start, end) for the introduction (level 1,
+    heading "") and every section, each span including its subsections.
+    """
+    headings = [
+        (len(match.group(1)), match.group(2), match.start())
+        for match in SECTION_HEADING.finditer(content)
+    ]
+    intro_end = headings[0][2] if headings else len(content)
+    sections = [(1, "", 0, intro_end)]
+    for position, (level, heading, start) in enumerate(headings):
+        end = next(
+            (later for depth, _, later in headings[position + 1 :] if depth <= level),
+            len(content),
+        )
+        sections.append((level, heading, start, end))
+    return tuple(sections)
+
+
+def section_outline(sections: tuple[tuple[int, str, int, int], ...]) -> str:
+    """One line per section: index, heading indented by level, and size."""
+    return "\n".join(
+        f"{'  ' * max(0, level - 2)}{index}. {heading or 'Introduction'} "
+        f"({end - start:,} characters)"
+        for index, (level, heading, start, end) in enumerate(sections)
+    )
+
+
+def cut_point(text: str, start: int, limit: int) -> int:
+    """
+    Where a slice of at most `limit` characters from `start` should end:
+    after the last whole sentence or line that fits, else after the last
+    whole word, as long as that keeps the slice at least half full.
+    """
+    stop = start + limit
+    if stop >= len(text):
+        return len(text)
+    best = text.rfind("\n", start, stop) + 1
+    line = text.rfind("\n", start, best - 1) + 1
+    if best > start and SECTION_HEADING.fullmatch(text, line, best - 1):
+        best = line  # not on a heading without its text
+    for match in SENTENCE_END.finditer(text, max(best, start), stop):
+        best = match.end()
+    if best <= start + limit // 2:
+        best = text.rfind(" ", start, stop) + 1
+    return best if best > start + limit // 2 else stop
+
+
+@dataclass
+class ParsedArticle:
+    """A page's text split up once, for the tools that serve parts of it."""
+
+    text: str
+    sections: tuple[tuple[int, str, int, int], ...]
+    sentence: int  # end of the first sentence
+    outline: str
+
+    def tier(self, detail: str) -> str:
+        """The text of one of the DETAILS levels."""
+        intro = self.text[: self.sections[0][3]].strip("\n")
+        if detail == "sentence":
+            return self.text[: self.sentence].strip()
+        if detail == "intro":
+            return intro
+        if detail == "outline":
+            return f"{intro}\n\n{self.outline}"
+        return self.text
+
+
+parsed: OrderedDict[tuple[str, int, str], ParsedArticle] = OrderedDict()
+
+
+def parse_article(page: Page) -> ParsedArticle:
+    """
+    Split the page's text (its content, or else its summary) into
+    sections and tiers, once per revision: paging through an article,
+    reading it by section or at several levels of detail parses it once.
+    """
+    field = "content" if page.content else "summary"
+    key = (page.url, page.revision, field)
+    if page.revision and key in parsed:
+        parsed.move_to_end(key)
+        return parsed[key]
+    text = getattr(page, field)
+    sections = split_sections(text)
+    intro = sections[0][3]
+    sentence = SENTENCE_END.search(text, 0, intro)
+    article = ParsedArticle(
+        text=text,
+        sections=sections,
+        sentence=sentence.end() if sentence else intro,
+        outline=section_outline(sections),
+    )
+    if page.revision:
+        parsed[key] = article
+        if len(parsed) > PARSED_SIZE:
+            parsed.popitem(last=False)
+    return article
+
+
+def content_view(page: Page, view: dict[str, Any]) -> tuple[str, str]:
+    """
+    Cut the part of the page's text asked for by the detail/section/index/
+    offset/max_chars arguments. Returns the text and the metadata lines
+    describing it.
+    """
+    article = parse_article(page)
+    content = article.text
+    sections = article.sections
+    section = view.get("section")
+    index = view.get("index")
+    detail = view.get("detail", "full")
+    start, end = 0, len(content)
+    lines = ""
+    if detail != "full" and (section is not None or index is not None):
+        raise ValueError("Use either detail or section/index, not both")
+    if index is not None:
+        if not 0 <= index < len(sections):
+            raise ValueError(
+                f"Section index {index} out of range: the page has sections "
+                f"0-{len(sections) - 1}"
             )
+        _, heading, start, end = sections[index]
+        lines += f"\n**Section:** {heading or 'Introduction'}"
+    elif section is not None:
+        wanted = section.strip().strip("=").strip().casefold()
+        match = next((span for span in sections if span[1].casefold() == wanted), None)
+        if match is None:
+            available = ", ".join(repr(span[1]) for span in sections)
+            raise ValueError(f"Section {section!r} not found. Sections: {available}")
+        _, heading, start, end = match
+        lines += f"\n**Section:** {heading or 'Introduction'}"
+    else:
+        headings = [span[1] for span in sections if span[0] == 2]
+        if headings:
+            lines += f"\n**Sections:** {', '.join(headings)}"
+        if detail != "full":
+            lines += f"\n**Detail:** {detail}"
 
-    return results
+    if detail != "full":
+        text = article.tier(detail)
+    else:
+        text = content[start:end].strip("\n")
+    offset = min(max(0, view.get("offset") or 0), len(text))
+    stop = len(text)
+    max_chars = view.get("max_chars")
+    if max_chars:
+        stop = cut_point(text, offset, max_chars)
+    lines += f"\n**Range:** {offset}-{stop} of {len(text)} characters"
+    if stop < len(text):
+        lines += f"\n**Next Offset:** {stop}"
+    return text[offset:stop], lines
+
+
+def page_results(
+    tool: str, result: Lookup, title: str, view: dict[str, Any] | None = None
+) -> list[types.TextContent]:
+    """
+    Format a resolved lookup as the metadata and text blocks of `tool`.
+    `view` holds the detail/section/index/offset/max_chars arguments.
+    """
+    label = tool.capitalize()
+    version = language_name(result.lang)
+    chain = result.chain or (result.lang,)
+
+    if result.error is not None:
+        logger.error(f"{label} retrieval error: {result.error}")
+        return [
+            types.TextContent(
+                type="text",
+                text=f"# {label} Error\n\n**Wikipedia Version:** Error\n**Language Code:** N/A\n**Requested Title:** {title}\n**Error:** {str(result.error)}",
+            )
+        ]
+
+    # Anything served from a later language means the first had nothing usable
+    fallback_note = (
+        f"\n**Note:** {language_name(chain[0])} version not available"
+        if result.lang != chain[0]
+        else ""
+    )
+
+    if result.disambiguation is not None:
+        options = result.disambiguation.options[:10]
+        return [
+            # Metadata
+            types.TextContent(
+                type="text",
+                text=f"# Disambiguation Metadata\n\n**Wikipedia Version:** {version}\n**Language Code:** {result.lang}\n**Requested Title:** {title}\n**Options Count:** {len(options)}{fallback_note}",
+            ),
+            # Disambiguation Options
+            types.TextContent(
+                type="text",
+                text="# Disambiguation Options\n\n**Did you mean:**\n"
+                + "\n".join([f"- {option}" for option in options]),
+            ),
+        ]
+
+    page = result.page
+    if page is None:
+        return [
+            types.TextContent(
+                type="text",
+                text=f"# {label} Not Found\n\n**Wikipedia Version:** None (not found)\n**Language Code:** N/A\n**Requested Title:** {title}\n**Error:** Page does not exist in {language_list(list(chain))} Wikipedia",
+            )
+        ]
+
+    if result.auto_suggested:
+        note = f"\n**Note:** Auto-suggested from '{title}'"
+    else:
+        note = fallback_note
+    if tool == "summary" and view:
+        text, lines = content_view(page, view)
+        length = f"{page.length} bytes{lines}"
+        body = f"# Page Summary\n\n{text}"
+    elif tool == "summary":
+        length = f"{page.length} bytes"
+        body = f"# Page Summary\n\n{page.summary}"
+    elif tool == "sections":
+        sections = parse_article(page).sections
+        length = f"{len(page.content)} characters\n**Section Count:** {len(sections)}"
+        body = f"# Page Sections\n\n{section_outline(sections)}"
+    elif view:
+        text, lines = content_view(page, view)
+        length = f"{len(page.content)} characters{lines}"
+        body = f"# Page Content\n\n{text}"
+    else:
+        length = f"{len(page.content)} characters"
+        body = f"# Page Content\n\n{page.content}"
+    return [
+        # Metadata
+        types.TextContent(
+            type="text",
+            text=f"# {label} Metadata\n\n**Title:** {page.title}\n**Wikipedia Version:** {version}\n**Language Code:** {result.lang}\n**URL:** {page.url}\n**Content Length:** {length}{note}",
+        ),
+        types.TextContent(type="text", text=body),
+    ]
+
+
+def view_arguments(arguments: dict[str, Any], names: tuple[str, ...]) -> dict[str, Any]:
+    """
+    The text-selection arguments among `names` that were given, with
+    max_tokens turned into (or capping) max_chars.
+    """
+    view = {name: arguments[name] for name in names if arguments.get(name) is not None}
+    tokens = view.pop("max_tokens", None)
+    if tokens:
+        chars = tokens * CHARS_PER_TOKEN
+        view["max_chars"] = min(view.get("max_chars", chars), chars)
+    return view
 
 
 async def handle_summary(arguments: dict[str, Any]) -> list[types.TextContent]:
@@ -237,324 +3054,408 @@ async def handle_summary(arguments: dict[str, Any]) -> list[types.TextContent]:
     if not title:
         raise ValueError("Title parameter is required")
 
-    results = []
+    view = view_arguments(arguments, ("detail", "max_chars", "max_tokens"))
+    if view.get("detail", "intro") not in DETAILS[:2]:
+        raise ValueError(
+            "Summary detail must be 'sentence' or 'intro'; "
+            "the content tool has 'outline' and 'full'"
+        )
 
-    # Try Simple English Wikipedia first (unless WIKIPEDIA_MODE=full)
-    if USE_SIMPLE_FIRST:
-        try:
-            wikipedia.set_lang("simple")
+    result = await resolve(
+        title, auto_suggest, "summary", languages(arguments.get("languages"))
+    )
+    return page_results("summary", result, title, view)
 
-            try:
-                page = wikipedia.page(title, auto_suggest=auto_suggest)
-
-                # Check if the page has reasonable content (not just a stub)
-                if len(page.content) > 500:  # Arbitrary threshold for "good quality"
-                    # Metadata
-                    results.append(
-                        types.TextContent(
-                            type="text",
-                            text=f"# Summary Metadata\n\n**Title:** {page.title}\n**Wikipedia Version:** Simple English\n**Language Code:** simple\n**URL:** {page.url}\n**Content Length:** {len(page.content)} characters",
-                        )
-                    )
-                    # Summary
-                    results.append(
-                        types.TextContent(
-                            type="text", text=f"# Page Summary\n\n{page.summary}"
-                        )
-                    )
-                    return results
-            except wikipedia.exceptions.DisambiguationError as e:
-                # Handle disambiguation by showing options
-                # Metadata
-                results.append(
-                    types.TextContent(
-                        type="text",
-                        text=f"# Disambiguation Metadata\n\n**Wikipedia Version:** Simple English\n**Language Code:** simple\n**Requested Title:** {title}\n**Options Count:** {len(e.options[:10])}",
-                    )
-                )
-                # Disambiguation Options
-                results.append(
-                    types.TextContent(
-                        type="text",
-                        text="# Disambiguation Options\n\n**Did you mean:**\n"
-                        + "\n".join([f"- {option}" for option in e.options[:10]]),
-                    )
-                )
-                return results
-            except wikipedia.exceptions.PageError:
-                # If auto_suggest is False, try with True before giving up
-                if not auto_suggest:
-                    try:
-                        page = wikipedia.page(title, auto_suggest=True)
-                        if len(page.content) > 500:
-                            results.append(
-                                types.TextContent(
-                                    type="text",
-                                    text=f"# Summary Metadata\n\n**Title:** {page.title}\n**Wikipedia Version:** Simple English\n**Language Code:** simple\n**URL:** {page.url}\n**Content Length:** {len(page.content)} characters\n**Note:** Auto-suggested from '{title}'",
-                                )
-                            )
-                            results.append(
-                                types.TextContent(
-                                    type="text",
-                                    text=f"# Page Summary\n\n{page.summary}",
-                                )
-                            )
-                            return results
-                    except Exception:
-                        pass
-                # Page doesn't exist in Simple English, will try regular English
-                pass
-        except Exception as e:
-            logger.warning(f"Simple English lookup failed: {e}")
 
-    # Fallback to English Wikipedia (or direct if WIKIPEDIA_MODE=full)
-    if not results or not USE_SIMPLE_FIRST:
-        try:
-            wikipedia.set_lang("en")
+async def handle_content(arguments: dict[str, Any]) -> list[types.TextContent]:
+    """Handle Wikipedia page content requests."""
+    title = arguments.get("title")
+    auto_suggest = arguments.get("auto_suggest", False)
 
-            try:
-                page = wikipedia.page(title, auto_suggest=auto_suggest)
-                # Metadata
-                results.append(
-                    types.TextContent(
-                        type="text",
-                        text=f"# Summary Metadata\n\n**Title:** {page.title}\n**Wikipedia Version:** English\n**Language Code:** en\n**URL:** {page.url}\n**Content Length:** {len(page.content)} characters\n**Note:** Simple English version not available",
-                    )
-                )
-                # Summary
-                results.append(
-                    types.TextContent(
-                        type="text", text=f"# Page Summary\n\n{page.summary}"
-                    )
-                )
-            except wikipedia.exceptions.DisambiguationError as e:
-                # Metadata
-                results.append(
-                    types.TextContent(
-                        type="text",
-                        text=f"# Disambiguation Metadata\n\n**Wikipedia Version:** English\n**Language Code:** en\n**Requested Title:** {title}\n**Options Count:** {len(e.options[:10])}\n**Note:** Simple English version not available",
-                    )
-                )
-                # Disambiguation Options
-                results.append(
-                    types.TextContent(
-                        type="text",
-                        text="# Disambiguation Options\n\n**Did you mean:**\n"
-                        + "\n".join([f"- {option}" for option in e.options[:10]]),
-                    )
-                )
-            except wikipedia.exceptions.PageError:
-                # If auto_suggest is False, try with True before giving up
-                if not auto_suggest:
-                    try:
-                        page = wikipedia.page(title, auto_suggest=True)
-                        results.append(
-                            types.TextContent(
-                                type="text",
-                                text=f"# Summary Metadata\n\n**Title:** {page.title}\n**Wikipedia Version:** English\n**Language Code:** en\n**URL:** {page.url}\n**Content Length:** {len(page.content)} characters\n**Note:** Auto-suggested from '{title}'",
-                            )
-                        )
-                        results.append(
-                            types.TextContent(
-                                type="text", text=f"# Page Summary\n\n{page.summary}"
-                            )
-                        )
-                        return results
-                    except Exception:
-                        pass
-                results.append(
-                    types.TextContent(
-                        type="text",
-                        text=f"# Summary Not Found\n\n**Wikipedia Version:** None (not found)\n**Language Code:** N/A\n**Requested Title:** {title}\n**Error:** Page does not exist in Simple English or English Wikipedia",
-                    )
-                )
+    if not title:
+        raise ValueError("Title parameter is required")
 
-        except Exception as e:
-            logger.error(f"Summary retrieval error: {e}")
-            results.append(
-                types.TextContent(
-                    type="text",
-                    text=f"# Summary Error\n\n**Wikipedia Version:** Error\n**Language Code:** N/A\n**Requested Title:** {title}\n**Error:** {str(e)}",
-                )
-            )
+    view = view_arguments(
+        arguments, ("detail", "section", "offset", "max_chars", "max_tokens")
+    )
+    if view.get("detail", "full") not in DETAILS:
+        raise ValueError(f"Detail must be one of {', '.join(DETAILS)}")
 
-    return results
+    result = await resolve(
+        title, auto_suggest, "content", languages(arguments.get("languages"))
+    )
+    return page_results("content", result, title, view)
 
 
-async def handle_content(arguments: dict[str, Any]) -> list[types.TextContent]:
-    """Handle Wikipedia page content requests."""
+async def handle_sections(arguments: dict[str, Any]) -> list[types.TextContent]:
+    """Handle requests for a page's section outline."""
     title = arguments.get("title")
     auto_suggest = arguments.get("auto_suggest", False)
 
     if not title:
         raise ValueError("Title parameter is required")
 
-    results = []
+    result = await resolve(
+        title, auto_suggest, "content", languages(arguments.get("languages"))
+    )
+    return page_results("sections", result, title)
 
-    # Try Simple English Wikipedia first (unless WIKIPEDIA_MODE=full)
-    if USE_SIMPLE_FIRST:
-        try:
-            wikipedia.set_lang("simple")
 
-            try:
-                page = wikipedia.page(title, auto_suggest=auto_suggest)
-
-                # Check if the page has reasonable content (not just a stub)
-                if len(page.content) > 500:  # Arbitrary threshold for "good quality"
-                    # Metadata
-                    results.append(
-                        types.TextContent(
-                            type="text",
-                            text=f"# Content Metadata\n\n**Title:** {page.title}\n**Wikipedia Version:** Simple English\n**Language Code:** simple\n**URL:** {page.url}\n**Content Length:** {len(page.content)} characters",
-                        )
-                    )
-                    # Full Content
-                    results.append(
-                        types.TextContent(
-                            type="text", text=f"# Page Content\n\n{page.content}"
-                        )
-                    )
-                    return results
-            except wikipedia.exceptions.DisambiguationError as e:
-                # Handle disambiguation by showing options
-                # Metadata
-                results.append(
-                    types.TextContent(
-                        type="text",
-                        text=f"# Disambiguation Metadata\n\n**Wikipedia Version:** Simple English\n**Language Code:** simple\n**Requested Title:** {title}\n**Options Count:** {len(e.options[:10])}",
-                    )
-                )
-                # Disambiguation Options
-                results.append(
-                    types.TextContent(
-                        type="text",
-                        text="# Disambiguation Options\n\n**Did you mean:**\n"
-                        + "\n".join([f"- {option}" for option in e.options[:10]]),
-                    )
-                )
-                return results
-            except wikipedia.exceptions.PageError:
-                # If auto_suggest is False, try with True before giving up
-                if not auto_suggest:
-                    try:
-                        page = wikipedia.page(title, auto_suggest=True)
-                        if len(page.content) > 500:
-                            results.append(
-                                types.TextContent(
-                                    type="text",
-                                    text=f"# Content Metadata\n\n**Title:** {page.title}\n**Wikipedia Version:** Simple English\n**Language Code:** simple\n**URL:** {page.url}\n**Content Length:** {len(page.content)} characters\n**Note:** Auto-suggested from '{title}'",
-                                )
-                            )
-                            results.append(
-                                types.TextContent(
-                                    type="text",
-                                    text=f"# Page Content\n\n{page.content}",
-                                )
-                            )
-                            return results
-                    except Exception:
-                        pass
-                # Page doesn't exist in Simple English, will try regular English
-                pass
-        except Exception as e:
-            logger.warning(f"Simple English lookup failed: {e}")
+async def handle_section(arguments: dict[str, Any]) -> list[types.TextContent]:
+    """Handle requests for one section of a page, by heading or index."""
+    title = arguments.get("title")
+    auto_suggest = arguments.get("auto_suggest", False)
 
-    # Fallback to English Wikipedia (or direct if WIKIPEDIA_MODE=full)
-    if not results or not USE_SIMPLE_FIRST:
-        try:
-            wikipedia.set_lang("en")
+    if not title:
+        raise ValueError("Title parameter is required")
+    if arguments.get("section") is None and arguments.get("index") is None:
+        raise ValueError("Section or index parameter is required")
 
-            try:
-                page = wikipedia.page(title, auto_suggest=auto_suggest)
-                # Metadata
-                results.append(
-                    types.TextContent(
-                        type="text",
-                        text=f"# Content Metadata\n\n**Title:** {page.title}\n**Wikipedia Version:** English\n**Language Code:** en\n**URL:** {page.url}\n**Content Length:** {len(page.content)} characters\n**Note:** Simple English version not available",
-                    )
-                )
-                # Full Content
-                results.append(
-                    types.TextContent(
-                        type="text", text=f"# Page Content\n\n{page.content}"
-                    )
-                )
-            except wikipedia.exceptions.DisambiguationError as e:
-                # Metadata
-                results.append(
-                    types.TextContent(
-                        type="text",
-                        text=f"# Disambiguation Metadata\n\n**Wikipedia Version:** English\n**Language Code:** en\n**Requested Title:** {title}\n**Options Count:** {len(e.options[:10])}\n**Note:** Simple English version not available",
-                    )
-                )
-                # Disambiguation Options
-                results.append(
-                    types.TextContent(
-                        type="text",
-                        text="# Disambiguation Options\n\n**Did you mean:**\n"
-                        + "\n".join([f"- {option}" for option in e.options[:10]]),
-                    )
-                )
-            except wikipedia.exceptions.PageError:
-                # If auto_suggest is False, try with True before giving up
-                if not auto_suggest:
-                    try:
-                        page = wikipedia.page(title, auto_suggest=True)
-                        results.append(
-                            types.TextContent(
-                                type="text",
-                                text=f"# Content Metadata\n\n**Title:** {page.title}\n**Wikipedia Version:** English\n**Language Code:** en\n**URL:** {page.url}\n**Content Length:** {len(page.content)} characters\n**Note:** Auto-suggested from '{title}'",
-                            )
-                        )
-                        results.append(
-                            types.TextContent(
-                                type="text", text=f"# Page Content\n\n{page.content}"
-                            )
-                        )
-                        return results
-                    except Exception:
-                        pass
-                results.append(
-                    types.TextContent(
-                        type="text",
-                        text=f"# Content Not Found\n\n**Wikipedia Version:** None (not found)\n**Language Code:** N/A\n**Requested Title:** {title}\n**Error:** Page does not exist in Simple English or English Wikipedia",
-                    )
-                )
+    view = view_arguments(
+        arguments, ("section", "index", "offset", "max_chars", "max_tokens")
+    )
 
-        except Exception as e:
-            logger.error(f"Content retrieval error: {e}")
-            results.append(
-                types.TextContent(
-                    type="text",
-                    text=f"# Content Error\n\n**Wikipedia Version:** Error\n**Language Code:** N/A\n**Requested Title:** {title}\n**Error:** {str(e)}",
-                )
+    result = await resolve(
+        title, auto_suggest, "content", languages(arguments.get("languages"))
+    )
+    return page_results("section", result, title, view)
+
+
+async def handle_batch(arguments: dict[str, Any], tool: str) -> list[types.TextContent]:
+    """
+    Handle summary_batch/content_batch requests.
+
+    Every language of the chain is resolved for all titles with one multi-title query
+    (run in parallel), then each title goes through the same lookup as the
+    single-title tool, using what that query loaded. Results come back in the
+    order of `titles`, with the usual blocks for each.
+    """
+    titles = arguments.get("titles")
+    auto_suggest = arguments.get("auto_suggest", False)
+
+    if not titles:
+        raise ValueError("Titles parameter is required")
+    # The low-level server does not check arguments against the schema
+    if not isinstance(titles, list) or not all(
+        isinstance(title, str) for title in titles
+    ):
+        raise ValueError("Titles must be a list of strings")
+    if len(titles) > MAX_BATCH_TITLES:
+        raise ValueError(f"At most {MAX_BATCH_TITLES} titles per call")
+
+    langs = languages(arguments.get("languages"))
+    prefetched = {}
+    if not auto_suggest:
+        try:
+            loaded = await asyncio.gather(
+                *(prefetch_pages(lang, titles, tool) for lang in langs)
             )
+            prefetched = dict(zip(langs, loaded))
+        except Exception as e:
+            # The per-title lookups below will report anything that matters
+            logger.warning(f"Batch prefetch failed: {e}")
 
+    lookups = await asyncio.gather(
+        *(resolve(title, auto_suggest, tool, langs, prefetched) for title in titles)
+    )
+    results = []
+    for title, result in zip(titles, lookups):
+        results.extend(page_results(tool, result, title))
     return results
 
 
+async def prewarm(
+    titles: list[str], top: int = 0, tools: tuple[str, ...] = ("summary",)
+) -> Counter:
+    """
+    Load `titles` (with the usual Simple English -> English fallback) and the
+    `top` most read cache keys into the cache, concurrently. Entries that are
+    still fresh are left alone. Returns how many lookups found a page, were
+    missing or failed.
+    """
+    jobs = [resolve(title, False, tool) for title in titles for tool in tools]
+    for lang, title, key_tool in await run_cache_io(cache.top, top) if top else []:
+        tool, _, auto_suggest = key_tool.partition(":")
+        jobs.append(
+            fetch_page(
+                lang,
+                title,
+                bool(auto_suggest),
+                summary=tool == "summary",
+                content=tool == "content",
+            )
+        )
+
+    token = recording_access.set(False)
+    try:
+        results = await asyncio.gather(*jobs, return_exceptions=True)
+    finally:
+        recording_access.reset(token)
+
+    counts = Counter()
+    for result in results:
+        if isinstance(result, PageError) or (
+            isinstance(result, Lookup)
+            and result.page is None
+            and result.disambiguation is None
+            and result.error is None
+        ):
+            counts["missing"] += 1
+        elif isinstance(result, Exception) or getattr(result, "error", None):
+            counts["failed"] += 1
+        else:
+            counts["warmed"] += 1
+    return counts
+
+
+def start_background_tasks() -> list[asyncio.Task]:
+    """Start the tasks that run next to the server on every transport."""
+    tasks = [asyncio.create_task(prune_cache(CACHE_PRUNE_INTERVAL))]
+    for entry in filter(None, TITLES.split(",")):
+        lang, _, path = entry.partition(":")
+
+        async def load_titles(lang: str = lang, path: str = path):
+            count = await run_blocking(title_index.load, lang, path)
+            logger.info(f"Loaded {count} {lang} titles from {path}")
+
+        tasks.append(asyncio.create_task(load_titles()))
+    if METRICS_LOG_INTERVAL > 0:
+        tasks.append(asyncio.create_task(log_metrics(METRICS_LOG_INTERVAL)))
+    if PREWARM_TOP > 0:
+
+        async def warm_up():
+            counts = await prewarm([], PREWARM_TOP)
+            logger.info(f"Prewarmed the {PREWARM_TOP} most read pages: {dict(counts)}")
+
+        tasks.append(asyncio.create_task(warm_up()))
+    return tasks
+
+
+# Warm-up: once a client has finished the MCP handshake, the fetch stack
+# (requests, BeautifulSoup) is imported and every wiki's pooled connection
+# opened in the background, so neither is paid for by the first tool call.
+# Until then the server only needs mcp itself. WIKIPEDIA_WARMUP=false turns
+# it off.
+WARMUP = os.environ.get("WIKIPEDIA_WARMUP", "true").lower() in ("1", "true", "yes")
+warm_ups: list[asyncio.Task] = []
+
+
+def warm_up_backends():
+    """Import the fetch stack and make one cheap request to every wiki."""
+    importlib.import_module("bs4")
+    for lang in languages():
+        client = get_client(lang)
+        if isinstance(client, WikipediaClient):
+            client.request(meta="siteinfo", siprop="general")
+
+
+async def handle_initialized(notification: types.InitializedNotification):
+    """Start the warm-up after the first handshake (HTTP serves many)."""
+    if not WARMUP or warm_ups:
+        return
+
+    async def warm_up():
+        started = time.perf_counter()
+        try:
+            await run_blocking(warm_up_backends)
+        except Exception as e:
+            logger.warning(f"Warm-up failed: {e}")
+            return
+        logger.info(f"Warmed up in {time.perf_counter() - started:.2f}s")
+
+    warm_ups.append(asyncio.create_task(warm_up()))
+
+
+server.notification_handlers[types.InitializedNotification] = handle_initialized
+
+
+def initialization_options() -> InitializationOptions:
+    return InitializationOptions(
+        server_name="wikipedia-se",
+        server_version="0.1.0",
+        capabilities=server.get_capabilities(
+            notification_options=NotificationOptions(),
+            experimental_capabilities={},
+        ),
+    )
+
+
 async def main():
     # Run the server using stdin/stdout streams
     from mcp.server.stdio import stdio_server
 
-    async with stdio_server() as (read_stream, write_stream):
-        await server.run(
-            read_stream,
-            write_stream,
-            InitializationOptions(
-                server_name="wikipedia-se",
-                server_version="0.1.0",
-                capabilities=server.get_capabilities(
-                    notification_options=NotificationOptions(),
-                    experimental_capabilities={},
-                ),
-            ),
-        )
+    # Held until the session ends, like the HTTP lifespan does
+    tasks = start_background_tasks()
+    try:
+        async with stdio_server() as (read_stream, write_stream):
+            await server.run(read_stream, write_stream, initialization_options())
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+def http_app(transport: str):
+    """
+    ASGI app serving MCP over streamable HTTP (at /mcp) or SSE (at /sse),
+    and Prometheus metrics at /metrics.
+
+    Every client session runs in this one process, so they all share the
+    response cache, in-flight lookups, the worker pool and the HTTP
+    connection pools to Wikipedia.
+    """
+    from contextlib import AsyncExitStack, asynccontextmanager
+
+    from starlette.applications import Starlette
+    from starlette.responses import PlainTextResponse, Response
+    from starlette.routing import Mount, Route
+
+    async def handle_metrics(request):
+        return PlainTextResponse(metrics_text(), media_type="text/plain; version=0.0.4")
+
+    routes = [Route("/metrics", endpoint=handle_metrics, methods=["GET"])]
+    sessions = None
+    if transport == "sse":
+        from mcp.server.sse import SseServerTransport
+
+        sse = SseServerTransport("/messages/")
+
+        async def handle_sse(request):
+            async with sse.connect_sse(
+                request.scope, request.receive, request._send
+            ) as (read_stream, write_stream):
+                await server.run(read_stream, write_stream, initialization_options())
+            return Response()
+
+        routes += [
+            Route("/sse", endpoint=handle_sse, methods=["GET"]),
+            Mount("/messages/", app=sse.handle_post_message),
+        ]
+    else:
+        from mcp.server.streamable_http_manager import StreamableHTTPSessionManager
+
+        sessions = StreamableHTTPSessionManager(app=server)
+        routes.append(Mount("/mcp", app=sessions.handle_request))
+
+    @asynccontextmanager
+    async def lifespan(app):
+        async with AsyncExitStack() as stack:
+            if sessions is not None:
+                await stack.enter_async_context(sessions.run())
+            for task in start_background_tasks():
+                stack.callback(task.cancel)
+            yield
+
+    return Starlette(routes=routes, lifespan=lifespan)
+
+
+def serve_http(transport: str, host: str, port: int):
+    """
+    Run one long-lived HTTP server for many clients.
+    On SIGINT/SIGTERM new connections are refused, open requests get
+    SHUTDOWN_GRACE seconds to finish, then the worker pool is drained.
+    """
+    import uvicorn
+
+    uvicorn.run(
+        http_app(transport),
+        host=host,
+        port=port,
+        timeout_graceful_shutdown=SHUTDOWN_GRACE,
+        log_level="info",
+    )
+    executor.shutdown(wait=True, cancel_futures=True)
+    cache_executor.shutdown(wait=True)
+
+
+def build_index(dump: str, lang: str, directory: str):
+    """Build or extend the offline index for `lang` from a dump file."""
+    client = OfflineClient(lang, os.path.join(directory, lang), create=True)
+    started = time.perf_counter()
+    counts = client.build(dump)
+    print(
+        f"{lang}: {counts['added']} added, {counts['updated']} updated, "
+        f"{counts['unchanged']} unchanged, {counts['redirects']} redirects "
+        f"in {time.perf_counter() - started:.1f}s -> {client.directory}"
+    )
+
+
+def prewarm_cli(titles: list[str], path: str | None, top: int, tools: list[str]):
+    """Fill the on-disk cache from the command line."""
+    if path:
+        with open(path, encoding="utf-8") as f:
+            titles += [line.strip() for line in f if line.strip()]
+    if not cache.db:
+        print("WIKIPEDIA_CACHE_PATH is empty; nothing would outlive this command")
+        return
+    started = time.perf_counter()
+    cache.prune()
+    counts = asyncio.run(prewarm(titles, top, tuple(tools)))
+    print(
+        f"{counts['warmed']} warmed, {counts['missing']} missing, "
+        f"{counts['failed']} failed in {time.perf_counter() - started:.1f}s "
+        f"-> {cache.path}"
+    )
 
 
 def cli():
     """Entry point for the mcp-se-wikipedia command."""
-    asyncio.run(main())
+    parser = argparse.ArgumentParser(
+        prog="mcp-se-wikipedia", description="Wikipedia Simple English MCP Server"
+    )
+    commands = parser.add_subparsers(dest="command")
+
+    build = commands.add_parser(
+        "build-index", help="Build the offline index from a Wikipedia dump"
+    )
+    build.add_argument(
+        "dump", help="pages-articles XML or CirrusSearch JSON dump (.bz2/.gz ok)"
+    )
+    build.add_argument(
+        "--lang", default="simple", help="Wiki the dump is from (default: simple)"
+    )
+    build.add_argument(
+        "--index",
+        default=OFFLINE_INDEX or "wikipedia-index",
+        help="Index directory (default: $WIKIPEDIA_OFFLINE_INDEX or ./wikipedia-index)",
+    )
+
+    warm = commands.add_parser(
+        "prewarm", help="Load pages into the on-disk cache ahead of time"
+    )
+    warm.add_argument("titles", nargs="*", help="Titles to load")
+    warm.add_argument("--file", help="File with one title per line")
+    warm.add_argument(
+        "--top", type=int, default=0, help="Also load the N most read pages"
+    )
+    warm.add_argument(
+        "--tool",
+        action="append",
+        choices=["summary", "content"],
+        help="What to load for each title; repeatable (default: summary)",
+    )
+
+    parser.add_argument(
+        "--transport",
+        choices=["stdio", "streamable-http", "sse"],
+        default="stdio",
+        help="stdio for one client, or HTTP to serve many (default: stdio)",
+    )
+    parser.add_argument(
+        "--host", default="127.0.0.1", help="HTTP address (default: 127.0.0.1)"
+    )
+    parser.add_argument(
+        "--port", type=int, default=8000, help="HTTP port (default: 8000)"
+    )
+
+    args = parser.parse_args()
+    if args.command == "build-index":
+        build_index(args.dump, args.lang, args.index)
+    elif args.command == "prewarm":
+        prewarm_cli(args.titles, args.file, args.top, args.tool or ["summary"])
+    elif args.transport != "stdio":
+        serve_http(args.transport, args.host, args.port)
+    else:
+        asyncio.run(main())
 
 
 if __name__ == "__main__":
@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+"""
+A local stand-in for the MediaWiki API, for benchmarking.
+
+Serves the subset of api.php that main.py uses (search, page info and
+extracts, disambiguation links) from fixture pages, one wiki per path
+prefix: http://127.0.0.1:8080/simple/w/api.php, .../en/w/api.php, .../de/...
+Latency and error rate are configurable, so numbers measured against it
+show the server's own overhead instead of network noise.
+
+Usage:
+    uv run python mock_api.py --port 8080 --latency 0.05 --error-rate 0.1 --maxlag-rate 0.05
+    WIKIPEDIA_API_URL=http://127.0.0.1:8080/{lang}/w/api.php uv run python main.py
+"""
+
+import argparse
+import json
+import random
+import re
+import threading
+import time
+import urllib.parse
+import zlib
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any
+
+HEADING = re.compile(r"^==.*==\s*$", re.MULTILINE)
+SENTENCE = re.compile(r"(?<=[.!?])\s+")
+
+
+def article(title: str, paragraphs: int) -> str:
+    """Plain-text article with an intro and `== Heading ==` sections."""
+    intro = f"{title} is a test article. It is served by the mock Wikipedia API."
+    sections = [
+        f"== Section {n} ==\n" + f"Section {n} of {title} has some text in it. " * 8
+        for n in range(1, paragraphs)
+    ]
+    return "\n\n".join([intro + " Lorem ipsum dolor sit amet." * 10, *sections])
+
+
+def default_fixtures(articles: int = 100) -> dict[str, dict[str, Any]]:
+    """
+    Fixture wikis covering every path through the server:
+
+    - Earth, Moon, Article 0..N-1: full articles in both wikis
+    - Stub: too short in Simple English, full in English
+    - English Only: missing from Simple English
+    - Mercury: a disambiguation page
+    - The Earth: a redirect to Earth
+    - German Only: only in a third wiki, de, for longer fallback chains
+    """
+    fixtures = {}
+    for lang in ("simple", "en"):
+        pages = {
+            title: {"text": article(title, 6)}
+            for title in ["Earth", "Moon"] + [f"Article {n}" for n in range(articles)]
+        }
+        pages["Stub"] = {
+            "text": "Stub is a short page." if lang == "simple" else article("Stub", 6)
+        }
+        pages["Mercury"] = {
+            "text": "Mercury may mean:",
+            "disambiguation": [
+                "Mercury (planet)",
+                "Mercury (element)",
+                "Freddie Mercury",
+            ],
+        }
+        if lang == "en":
+            pages["English Only"] = {"text": article("English Only", 6)}
+        fixtures[lang] = {"pages": pages, "redirects": {"The Earth": "Earth"}}
+    fixtures["de"] = {
+        "pages": {"German Only": {"text": article("German Only", 6)}},
+        "redirects": {},
+    }
+    return fixtures
+
+
+def normalize(title: str) -> str:
+    title = " ".join(title.replace("_", " ").split())
+    return title[:1].upper() + title[1:]
+
+
+class MockWikipedia:
+    """
+    The stand-in API, runnable in a background thread.
+
+    `latency` seconds (plus up to `jitter` more) are spent on every request;
+    a fraction `error_rate` of requests fails with HTTP 503 and another
+    `maxlag_rate` with a maxlag API error, both with Retry-After set to
+    `retry_after` seconds.
+    With `every_title`, a title that is in none of the fixture wikis gets a
+    generated article in all of them, so logs of real traffic can be
+    replayed against it.
+    `requests` counts requests per wiki.
+    """
+
+    def __init__(
+        self,
+        fixtures: dict[str, dict[str, Any]] | None = None,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        error_rate: float = 0.0,
+        maxlag_rate: float = 0.0,
+        retry_after: float = 1,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        every_title: bool = False,
+    ):
+        self.fixtures = fixtures or default_fixtures()
+        self.every_title = every_title
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.maxlag_rate = maxlag_rate
+        self.retry_after = retry_after
+        self.requests = Counter()
+        self.http = ThreadingHTTPServer((host, port), self.handler())
+        self.http.daemon_threads = True
+
+    @property
+    def url(self) -> str:
+        """API URL template for WIKIPEDIA_API_URL."""
+        host, port = self.http.server_address[:2]
+        return f"http://{host}:{port}/{{lang}}/w/api.php"
+
+    def start(self) -> "MockWikipedia":
+        threading.Thread(target=self.http.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.http.shutdown()
+        self.http.server_close()
+
+    def handler(self) -> type[BaseHTTPRequestHandler]:
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Send headers and body in one write; separate small writes on a
+            # keep-alive connection stall on delayed ACKs
+            wbufsize = 1 << 20
+
+            def do_GET(self):
+                url = urllib.parse.urlsplit(self.path)
+                lang = url.path.strip("/").split("/")[0]
+                params = dict(urllib.parse.parse_qsl(url.query))
+                mock.requests[lang] += 1
+                time.sleep(mock.latency + random.uniform(0, mock.jitter))
+
+                retry = {"Retry-After": f"{mock.retry_after:g}"}
+                roll = random.random()
+                if roll < mock.error_rate:
+                    self.reply(503, {"error": "injected"}, retry)
+                elif roll < mock.error_rate + mock.maxlag_rate:
+                    error = {"code": "maxlag", "info": "Waiting for a database server"}
+                    self.reply(200, {"error": error}, retry)
+                elif lang not in mock.fixtures:
+                    self.reply(404, {"error": f"no wiki {lang!r}"})
+                else:
+                    self.reply(200, mock.answer(lang, params))
+
+            def reply(self, status: int, body: dict, headers: dict | None = None):
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def answer(self, lang: str, params: dict[str, str]) -> dict:
+        """The JSON api.php would return for `params` (formatversion=2)."""
+        wiki = self.fixtures[lang]
+        if params.get("action") == "parse":
+            options = wiki["pages"].get(params.get("page"), {}).get("disambiguation")
+            if options is None:
+                return {"error": {"code": "missingtitle", "info": "No such page."}}
+            items = "".join(
+                f'<li><a href="/wiki/{urllib.parse.quote(option)}">{option}</a></li>'
+                for option in options
+            )
+            return {"parse": {"title": params["page"], "text": f"<ul>{items}</ul>"}}
+
+        if params.get("list") == "search":
+            hits = self.search(wiki, params["srsearch"], int(params.get("srlimit", 10)))
+            return {"query": {"searchinfo": {}, "search": [{"title": t} for t in hits]}}
+
+        if params.get("generator") == "search":
+            hits = self.search(
+                wiki, params["gsrsearch"], int(params.get("gsrlimit", 10))
+            )
+            pages = []
+            for index, title in enumerate(hits, 1):
+                page = self.page(lang, title, params)
+                page["index"] = index
+                sentences = int(params.get("exsentences", 0))
+                if sentences and "extract" in page:
+                    page["extract"] = " ".join(
+                        SENTENCE.split(page["extract"])[:sentences]
+                    )
+                pages.append(page)
+            return {"query": {"pages": pages}}
+
+        query: dict[str, Any] = {"pages": []}
+        for requested in params.get("titles", "").split("|"):
+            title = normalize(requested)
+            if title != requested:
+                query.setdefault("normalized", []).append(
+                    {"from": requested, "to": title}
+                )
+            if params.get("redirects") and title in wiki["redirects"]:
+                target = wiki["redirects"][title]
+                query.setdefault("redirects", []).append({"from": title, "to": target})
+                title = target
+            query["pages"].append(self.page(lang, title, params))
+        return {"query": query}
+
+    def search(self, wiki: dict, query: str, limit: int) -> list[str]:
+        """Titles containing every word of `query`; title matches first."""
+        words = query.casefold().split()
+        in_title, in_text = [], []
+        for title, page in wiki["pages"].items():
+            if all(word in title.casefold() for word in words):
+                in_title.append(title)
+            elif all(word in page["text"].casefold() for word in words):
+                in_text.append(title)
+        return (in_title + in_text)[:limit]
+
+    def page(self, lang: str, title: str, params: dict[str, str]) -> dict:
+        """One entry of a query's `pages` list."""
+        fixture = self.fixtures[lang]["pages"].get(title)
+        if (
+            fixture is None
+            and self.every_title
+            and title
+            and not any(title in wiki["pages"] for wiki in self.fixtures.values())
+        ):
+            fixture = {"text": article(title, 6)}
+        if fixture is None:
+            return {"title": title, "missing": True}
+        page = {
+            "title": title,
+            "fullurl": f"https://{lang}.wikipedia.org/wiki/{title.replace(' ', '_')}",
+            "length": len(fixture["text"].encode()),
+            "lastrevid": zlib.crc32(fixture["text"].encode()),
+        }
+        if "disambiguation" in fixture:
+            page["pageprops"] = {"disambiguation": ""}
+        if "extracts" in params.get("prop", ""):
+            text = fixture["text"]
+            if params.get("exintro"):
+                text = HEADING.split(text)[0].strip()
+            page["extract"] = text
+        return page
+
+
+def cli():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument(
+        "--latency", type=float, default=0.0, help="Seconds per request"
+    )
+    parser.add_argument(
+        "--jitter", type=float, default=0.0, help="Up to this much more"
+    )
+    parser.add_argument(
+        "--error-rate", type=float, default=0.0, help="Fraction answered with HTTP 503"
+    )
+    parser.add_argument(
+        "--maxlag-rate", type=float, default=0.0, help="Fraction answered with maxlag"
+    )
+    parser.add_argument(
+        "--retry-after", type=float, default=1, help="Retry-After on errors (s)"
+    )
+    parser.add_argument(
+        "--fixtures", help="JSON file: {lang: {pages: {title: {text, ...}}, redirects}}"
+    )
+    parser.add_argument(
+        "--every-title",
+        action="store_true",
+        help="Generate an article for titles not in the fixtures",
+    )
+    args = parser.parse_args()
+
+    fixtures = None
+    if args.fixtures:
+        with open(args.fixtures) as f:
+            fixtures = json.load(f)
+    mock = MockWikipedia(
+        fixtures,
+        args.latency,
+        args.jitter,
+        args.error_rate,
+        args.maxlag_rate,
+        args.retry_after,
+        args.host,
+        args.port,
+        args.every_title,
+    )
+    print(f"WIKIPEDIA_API_URL={mock.url}")
+    try:
+        mock.http.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    cli()